@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+asset reference graph for loyal.love-website
+indexes which page references which asset (html, css, rss.xml) once,
+caches the parse per source by content hash, and answers usage queries
+"""
+
+import os
+import re
+import sys
+import json
+import html
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from html_utils import resolve_local_path
+
+
+########################################################
+#       constants
+########################################################
+
+CACHE_FILE: str = '.cache/asset-graph.json'
+CACHE_VERSION: int = 1
+
+SOURCE_GLOBS: List[str] = ['index.html', 'chapters/*.html', 'shared/*.html', 'css/*.css', 'rss.xml']
+ASSET_DIRS: List[str] = ['imgs', 'css', 'scripts', 'shared']
+ASSET_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.webp', '.gif', '.ico', '.svg',
+    '.mp4', '.mov', '.webm', '.css', '.js', '.html',
+}
+RASTER_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+VARIANT_SUFFIXES = ('_optimized', '_webp', '_poster')
+
+# (kind, pattern): 'load' edges are fetched with the page, 'link' edges only on click
+HTML_PATTERNS: List[Tuple[str, re.Pattern]] = [
+    ('load', re.compile(r'<(?:img|script|source|video|audio|iframe)\b[^>]*?\ssrc\s*=\s*["\']([^"\']+)["\']', re.I)),
+    ('load', re.compile(r'<video\b[^>]*?\sposter\s*=\s*["\']([^"\']+)["\']', re.I)),
+    ('load', re.compile(r'<link\b(?=[^>]*rel\s*=\s*["\'](?:stylesheet|icon|preload)["\'])[^>]*?\shref\s*=\s*["\']([^"\']+)["\']', re.I)),
+    ('link', re.compile(r'<a\b[^>]*?\shref\s*=\s*["\']([^"\']+)["\']', re.I)),
+]
+INCLUDE_PATTERN = re.compile(r'include(Title|Footer)\(')
+CSS_URL_PATTERN = re.compile(r'url\(\s*["\']?([^"\')]+)["\']?\s*\)', re.I)
+CSS_IMPORT_PATTERN = re.compile(r'@import\s+["\']([^"\']+)["\']', re.I)
+SITE_URL_PATTERN = re.compile(r'https?://(?:www\.)?loyal\.love/[^\s"\'<>&]+')
+RSS_SRC_PATTERN = re.compile(r'src\s*=\s*["\']([^"\']+)["\']', re.I)
+
+
+########################################################
+#       extraction
+########################################################
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def extract_references(source: str, text: str) -> List[Tuple[str, str]]:
+    """return sorted (kind, repo path) references found in one source file"""
+    found: Set[Tuple[str, str]] = set()
+
+    def add(kind, reference):
+        target = resolve_local_path(html.unescape(reference), source)
+        if target:
+            found.add((kind, target))
+
+    if source.endswith('.css'):
+        for pattern in (CSS_URL_PATTERN, CSS_IMPORT_PATTERN):
+            for match in pattern.finditer(text):
+                add('load', match.group(1))
+    elif source.endswith('.xml'):
+        unescaped = html.unescape(text)
+        for match in RSS_SRC_PATTERN.finditer(unescaped):
+            add('load', match.group(1))
+        for match in SITE_URL_PATTERN.finditer(unescaped):
+            add('link', match.group(0))
+    else:
+        for kind, pattern in HTML_PATTERNS:
+            for match in pattern.finditer(text):
+                add(kind, match.group(1))
+        for match in INCLUDE_PATTERN.finditer(text):
+            found.add(('load', f"shared/{match.group(1).lower()}.html"))
+        for match in SITE_URL_PATTERN.finditer(text):
+            add('link', match.group(0))
+
+    # an asset loaded by the page is not also "just linked"
+    loads = {target for kind, target in found if kind == 'load'}
+    return sorted((kind, target) for kind, target in found if kind == 'load' or target not in loads)
+
+
+def find_sources(root: Path) -> List[str]:
+    sources = set()
+    for pattern in SOURCE_GLOBS:
+        for path in root.glob(pattern):
+            if path.is_file():
+                sources.add(path.relative_to(root).as_posix())
+    return sorted(sources)
+
+
+def find_assets(root: Path) -> Dict[str, int]:
+    assets = {}
+    for directory in ASSET_DIRS:
+        for path in (root / directory).rglob('*'):
+            if path.is_file() and path.suffix.lower() in ASSET_EXTENSIONS:
+                assets[path.relative_to(root).as_posix()] = path.stat().st_size
+    return assets
+
+
+########################################################
+#       graph
+########################################################
+
+def load_cache(cache_path: Path) -> Dict:
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'version': CACHE_VERSION, 'sources': {}}
+
+
+def build_graph(root: str = '.', cache_file: str = CACHE_FILE) -> Dict:
+    """build (or refresh from cache) the reference graph for the site at root"""
+    root_path = Path(root)
+    cache_path = root_path / cache_file
+    cache = load_cache(cache_path)
+    sources = {}
+    parsed = 0
+
+    for source in find_sources(root_path):
+        data = (root_path / source).read_bytes()
+        digest = hash_bytes(data)
+        cached = cache['sources'].get(source)
+        if cached and cached['hash'] == digest:
+            sources[source] = cached
+            continue
+        refs = extract_references(source, data.decode('utf-8', errors='ignore'))
+        sources[source] = {'hash': digest, 'bytes': len(data), 'refs': refs}
+        parsed += 1
+
+    if parsed or set(sources) != set(cache['sources']):
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'sources': sources}, f)
+
+    assets = find_assets(root_path)
+    for source, entry in sources.items():
+        assets.setdefault(source, entry['bytes'])
+
+    referenced_by: Dict[str, List[str]] = {}
+    for source, entry in sources.items():
+        for _, target in entry['refs']:
+            referenced_by.setdefault(target, []).append(source)
+
+    return {
+        'sources': sources,
+        'assets': assets,
+        'referenced_by': referenced_by,
+        'parsed': parsed,
+    }
+
+
+def variants_of(asset: str) -> List[str]:
+    """generated variants of a source image (see optimize-images.py)"""
+    stem, ext = os.path.splitext(asset)
+    return [f"{stem}_optimized{ext}", f"{stem}_webp.webp"]
+
+
+def base_of(asset: str) -> str:
+    """map a generated variant back to the path stem of its source"""
+    stem, _ = os.path.splitext(asset)
+    for suffix in VARIANT_SUFFIXES:
+        if stem.endswith(suffix):
+            return stem[:-len(suffix)]
+    return stem
+
+
+def page_loads(graph: Dict, page: str) -> Set[str]:
+    """every path fetched when page loads, following css and fragments"""
+    seen: Set[str] = set()
+    stack = [page]
+    while stack:
+        current = stack.pop()
+        for kind, target in graph['sources'].get(current, {}).get('refs', []):
+            if kind == 'load' and target not in seen:
+                seen.add(target)
+                stack.append(target)
+    return seen
+
+
+def page_weights(graph: Dict) -> List[Dict]:
+    """total transfer bytes per html page, heaviest first"""
+    weights = []
+    for page in graph['sources']:
+        if not page.endswith('.html') or page.startswith('shared/'):
+            continue
+        loads = page_loads(graph, page)
+        missing = sorted(path for path in loads if path not in graph['assets'])
+        asset_bytes = sum(graph['assets'].get(path, 0) for path in loads)
+        weights.append({
+            'page': page,
+            'html_bytes': graph['assets'][page],
+            'asset_bytes': asset_bytes,
+            'total_bytes': graph['assets'][page] + asset_bytes,
+            'requests': 1 + len(loads) - len(missing),
+            'missing': missing,
+        })
+    return sorted(weights, key=lambda w: w['total_bytes'], reverse=True)
+
+
+def unused_assets(graph: Dict) -> List[str]:
+    """files under imgs/ that no page, stylesheet or feed references"""
+    referenced_bases = {base_of(path) for path in graph['referenced_by']}
+    return sorted(
+        path for path in graph['assets']
+        if path.startswith('imgs/') and path not in graph['referenced_by'] and base_of(path) not in referenced_bases
+    )
+
+
+def missing_optimized(graph: Dict) -> List[str]:
+    """referenced jpg/png images without an optimized or webp variant"""
+    missing = []
+    for path in graph['referenced_by']:
+        if os.path.splitext(path)[1].lower() not in RASTER_EXTENSIONS or path not in graph['assets']:
+            continue
+        if base_of(path) != os.path.splitext(path)[0]:
+            continue
+        if not any(variant in graph['assets'] for variant in variants_of(path)):
+            missing.append(path)
+    return sorted(missing)
+
+
+########################################################
+#       cli
+########################################################
+
+def format_mb(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f}mb"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='query the asset reference graph')
+    parser.add_argument('--root', default='.', help='site root (default: current directory)')
+    parser.add_argument('--unused', action='store_true', help='list assets that nothing references')
+    parser.add_argument('--heaviest', type=int, nargs='?', const=10, help='list the N heaviest pages')
+    parser.add_argument('--missing-optimized', action='store_true', help='list images without optimized variants')
+    parser.add_argument('--page', help='list everything a page loads')
+    parser.add_argument('--json', action='store_true', help='print results as json')
+    args = parser.parse_args()
+
+    graph = build_graph(args.root)
+    results = {}
+    if args.unused:
+        results['unused'] = unused_assets(graph)
+    if args.heaviest:
+        results['heaviest'] = page_weights(graph)[:args.heaviest]
+    if args.missing_optimized:
+        results['missing_optimized'] = missing_optimized(graph)
+    if args.page:
+        results['page'] = sorted(page_loads(graph, args.page))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"👾 {len(graph['sources'])} sources ({graph['parsed']} re-parsed), {len(graph['assets'])} assets")
+    for path in results.get('unused', []):
+        print(f"  unused: {path} ({format_mb(graph['assets'][path])})")
+    for weight in results.get('heaviest', []):
+        print(f"  {weight['page']}: {format_mb(weight['total_bytes'])} in {weight['requests']} requests")
+        for path in weight['missing']:
+            print(f"    ❌ missing: {path}")
+    for path in results.get('missing_optimized', []):
+        print(f"  no optimized variant: {path}")
+    for path in results.get('page', []):
+        print(f"  {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+build pipeline benchmark for loyal.love-website
+generates synthetic corpora of growing size (chapters x posts) and times each
+stage on them: post extraction, the post store import, rss, the reference
+scan, precompression and image optimization. the log-log slope of time
+against post count shows whether a stage scales linearly (~1.0) or worse,
+results are saved as json next to the server benchmark's
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bench_server import RESULTS_DIR, git_commit
+from synthetic_corpus import generate_corpus
+
+
+########################################################
+#       constants
+########################################################
+
+DEFAULT_SIZES: str = '4x10,8x20,16x40'
+STAGE_NAMES: List[str] = ['extract', 'import', 'rss', 'references', 'precompress', 'images']
+EXPONENT_WARNING: float = 1.3
+
+
+########################################################
+#       stages
+########################################################
+
+def page_files() -> List[str]:
+    return ['index.html'] + sorted(p.as_posix() for p in Path('chapters').glob('*.html'))
+
+
+def reset_store() -> None:
+    import post_store
+    post_store._record_cache.clear()
+    post_store._frame_cache.clear()
+    shutil.rmtree(post_store.POSTS_DIR, ignore_errors=True)
+
+
+def stage_extract() -> None:
+    from generate_rss import extract_post_data
+    for page in page_files():
+        with open(page, 'r', encoding='utf-8') as f:
+            extract_post_data(f.read(), page)
+
+
+def stage_import() -> None:
+    from post_store import import_page
+    for page in page_files():
+        import_page(page)
+
+
+def stage_rss() -> None:
+    from generate_rss import generate_rss
+    generate_rss()
+
+
+def reset_references() -> None:
+    from asset_graph import CACHE_FILE
+    if os.path.exists(CACHE_FILE):
+        os.remove(CACHE_FILE)
+
+
+def stage_references() -> None:
+    from asset_graph import build_graph
+    build_graph('.')
+
+
+def reset_precompress() -> None:
+    for path in Path('.').rglob('*.gz'):
+        if path.name != 'sitemap.xml.gz':
+            path.unlink()
+
+
+def stage_precompress() -> None:
+    from server import create_gzip_files
+    create_gzip_files('.')
+
+
+def reset_images() -> None:
+    optimize_images = load_optimize_images()
+    for path in Path('imgs').iterdir():
+        if optimize_images.is_variant(path) or path.name == 'manifest.json':
+            path.unlink()
+
+
+def stage_images(workers: int) -> None:
+    load_optimize_images().optimize_images_in_directory('imgs', workers=workers)
+
+
+def load_optimize_images():
+    from build import load_script
+    return load_script('optimize-images.py')
+
+
+def stages(workers: int) -> Dict[str, Tuple[Optional[Callable], Callable]]:
+    """{name: (reset, run)}, reset puts the corpus back to where the stage has work to do"""
+    return {
+        'extract': (None, stage_extract),
+        'import': (reset_store, stage_import),
+        'rss': (None, stage_rss),
+        'references': (reset_references, stage_references),
+        'precompress': (reset_precompress, stage_precompress),
+        'images': (reset_images, lambda: stage_images(workers)),
+    }
+
+
+def time_stage(reset: Optional[Callable], run: Callable, repeat: int) -> float:
+    """best of repeat runs, with the stages' own progress output swallowed"""
+    best = math.inf
+    for _ in range(repeat):
+        if reset:
+            reset()
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - started)
+    return best
+
+
+########################################################
+#       scaling
+########################################################
+
+def parse_sizes(sizes: str) -> List[Tuple[int, int]]:
+    return [tuple(int(v) for v in size.lower().split('x')) for size in sizes.split(',') if size.strip()]
+
+
+def scaling_exponent(points: List[Tuple[int, float]]) -> Optional[float]:
+    """least squares slope of log(seconds) against log(posts)"""
+    points = [(math.log(n), math.log(s)) for n, s in points if n > 0 and s > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if not spread:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def benchmark(sizes: List[Tuple[int, int]], names: List[str], repeat: int, image_size: Tuple[int, int],
+              workers: int, seed: int) -> Dict:
+    runs = []
+    available = stages(workers)
+    original = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='loyal-corpus-') as scratch:
+        for chapters, posts in sizes:
+            root = os.path.join(scratch, f"{chapters}x{posts}")
+            counts = generate_corpus(root, chapters, posts, image_size=image_size, seed=seed)
+            os.chdir(root)
+            try:
+                reset_store()
+                seconds = {}
+                for name in STAGE_NAMES:
+                    if name in names:
+                        seconds[name] = time_stage(*available[name], repeat)
+            finally:
+                os.chdir(original)
+            runs.append({'chapters': chapters, 'posts_per_chapter': posts, 'posts': counts['posts'],
+                         'images': counts['images'], 'seconds': seconds})
+            print(f"✓ {chapters:>3} chapters × {posts:<3} posts  "
+                  + '  '.join(f"{name} {value * 1000:8.1f}ms" for name, value in seconds.items()))
+
+    exponents = {name: scaling_exponent([(run['posts'], run['seconds'][name]) for run in runs])
+                 for name in STAGE_NAMES if name in names}
+    return {'runs': runs, 'exponents': exponents}
+
+
+def print_scaling(exponents: Dict[str, Optional[float]], limit: float) -> List[str]:
+    """print the exponent per stage, returns the stages above limit"""
+    print("\n👾 scaling (time ∝ posts^k)")
+    over = []
+    for name, exponent in exponents.items():
+        if exponent is None:
+            print(f"  {name:<12} k =   n/a")
+            continue
+        flag = ''
+        if exponent > limit:
+            flag = '  ⚠️  superlinear'
+            over.append(name)
+        print(f"  {name:<12} k = {exponent:5.2f}{flag}")
+    return over
+
+
+def save_results(report: Dict, output: Optional[str]) -> str:
+    if not output:
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        output = os.path.join(RESULTS_DIR, f"pipeline-{stamp}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return output
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='time the build pipeline on synthetic corpora of growing size')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'CHAPTERSxPOSTS, comma separated (default: {DEFAULT_SIZES})')
+    parser.add_argument('--stage', action='append', choices=STAGE_NAMES, help='time only these stages (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the best one counts')
+    parser.add_argument('--image-size', default='800x600', help='WIDTHxHEIGHT of the generated images')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='image optimization workers')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--max-exponent', type=float,
+                        help='exit with an error when a stage scales worse than posts^k (e.g. 1.3)')
+    parser.add_argument('--output', help=f'where to save the json results (default: {RESULTS_DIR}/pipeline-<time>-<commit>.json)')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sizes = parse_sizes(args.sizes)
+    names = args.stage or STAGE_NAMES
+    width, height = (int(v) for v in args.image_size.lower().split('x'))
+    print(f"👾 timing {', '.join(names)} on {len(sizes)} corpora, best of {args.repeat}")
+    try:
+        results = benchmark(sizes, names, args.repeat, (width, height), args.workers, args.seed)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"❌ benchmark failed: {e}")
+        return 1
+
+    over = print_scaling(results['exponents'], args.max_exponent or EXPONENT_WARNING)
+    report = {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'repeat': args.repeat,
+        'image_size': args.image_size,
+        **results,
+    }
+    print(f"\n✅ results saved to {save_results(report, args.output)}")
+    if args.max_exponent and over:
+        print(f"❌ {', '.join(over)} scale worse than posts^{args.max_exponent}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+load and latency benchmark for scripts/server.py
+starts the server on a free port, replays page loads (the html plus every
+<img>, stylesheet and script it references) from concurrent asyncio clients,
+with and without gzip, cold (fresh server) and warm (after one full pass),
+and reports requests/s, bytes/s and p50/p95/p99 latency. results are saved
+as json so runs can be compared across commits with --compare
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from html_utils import find_tags, get_attr, resolve_local_path
+
+
+########################################################
+#       constants
+########################################################
+
+SCRIPTS_DIR: str = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR: str = '.cache/bench'
+PAGE_GLOBS: List[str] = ['index.html', 'chapters/*.html']
+SCENARIOS: List[Tuple[str, bool, bool]] = [
+    ('cold-identity', False, False), ('cold-gzip', True, False),
+    ('warm-identity', False, True), ('warm-gzip', True, True),
+]
+PARALLEL_ASSETS: int = 6
+STARTUP_TIMEOUT: float = 10.0
+
+
+########################################################
+#       page loads
+########################################################
+
+def page_requests(root: str, page: str) -> List[str]:
+    """url paths a browser requests for one page: the html, then its images, css and js"""
+    with open(os.path.join(root, page), 'r', encoding='utf-8') as f:
+        html = f.read()
+    paths = []
+    for tag_name, attrs in (('img', ('src', 'data-src')), ('link', ('href',)), ('script', ('src',))):
+        for match in find_tags(html, tag_name):
+            tag = match.group(0)
+            if tag_name == 'link' and (get_attr(tag, 'rel') or '').lower() not in ('stylesheet', 'preload', 'icon'):
+                continue
+            for attr in attrs:
+                path = resolve_local_path(get_attr(tag, attr), page)
+                if path and os.path.isfile(os.path.join(root, path)) and f'/{path}' not in paths:
+                    paths.append(f'/{path}')
+    return [f'/{page}'] + paths
+
+
+def load_plan(root: str) -> Dict[str, List[str]]:
+    pages = sorted({p.relative_to(root).as_posix() for pattern in PAGE_GLOBS for p in Path(root).glob(pattern)})
+    return {page: page_requests(root, page) for page in pages}
+
+
+########################################################
+#       client
+########################################################
+
+async def fetch(host: str, port: int, path: str, accept_gzip: bool) -> Dict:
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    headers = f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n"
+    if accept_gzip:
+        headers += "Accept-Encoding: gzip\r\n"
+    writer.write((headers + "\r\n").encode('ascii'))
+    await writer.drain()
+    response = await reader.read()
+    elapsed = time.perf_counter() - started
+    writer.close()
+    header_end = response.find(b'\r\n\r\n')
+    status_line = response[:response.find(b'\r\n')].split(b' ')
+    return {
+        'status': int(status_line[1]) if len(status_line) > 1 else 0,
+        'bytes': len(response) - header_end - 4 if header_end != -1 else 0,
+        'seconds': elapsed,
+    }
+
+
+async def page_load(host: str, port: int, requests: List[str], accept_gzip: bool) -> List[Dict]:
+    """the html first, then its assets with a browser-like number of parallel connections"""
+    results = [await fetch(host, port, requests[0], accept_gzip)]
+    limit = asyncio.Semaphore(PARALLEL_ASSETS)
+
+    async def asset(path):
+        async with limit:
+            return await fetch(host, port, path, accept_gzip)
+    results += await asyncio.gather(*(asset(path) for path in requests[1:]))
+    return results
+
+
+async def run_clients(host: str, port: int, plan: Dict[str, List[str]], accept_gzip: bool,
+                      concurrency: int, loads: int) -> Dict:
+    """concurrency clients share `loads` page loads, cycling through the pages"""
+    queue: asyncio.Queue = asyncio.Queue()
+    pages = list(plan.values())
+    for i in range(loads):
+        queue.put_nowait(pages[i % len(pages)])
+    requests, page_seconds, errors = [], [], 0
+
+    async def client():
+        nonlocal errors
+        while not queue.empty():
+            page = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                results = await page_load(host, port, page, accept_gzip)
+            except OSError:
+                errors += 1
+                continue
+            page_seconds.append(time.perf_counter() - started)
+            requests.extend(results)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return {'requests': requests, 'page_seconds': page_seconds, 'errors': errors,
+            'wall_seconds': time.perf_counter() - started}
+
+
+########################################################
+#       server and stats
+########################################################
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(root: str, port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SCRIPTS_DIR, 'server.py'), '--host', '127.0.0.1', '--port', str(port),
+         '--root', root],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(run: Dict) -> Dict:
+    latencies = [r['seconds'] * 1000 for r in run['requests']]
+    total_bytes = sum(r['bytes'] for r in run['requests'])
+    wall = max(run['wall_seconds'], 1e-9)
+    return {
+        'requests': len(run['requests']),
+        'page_loads': len(run['page_seconds']),
+        'errors': run['errors'] + sum(1 for r in run['requests'] if r['status'] >= 400),
+        'requests_per_second': len(run['requests']) / wall,
+        'bytes_per_second': total_bytes / wall,
+        'bytes': total_bytes,
+        'latency_ms': {name: percentile(latencies, q) for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))},
+        'page_load_ms': {name: percentile([s * 1000 for s in run['page_seconds']], q)
+                         for name, q in (('p50', 0.5), ('p95', 0.95))},
+        'wall_seconds': run['wall_seconds'],
+    }
+
+
+def benchmark(root: str, concurrency: int, loads: int, scenarios: List[str],
+              url: Optional[Tuple[str, int]] = None) -> Dict:
+    plan = load_plan(root)
+    if not plan:
+        raise FileNotFoundError(f"no pages found in {root}")
+    results = {}
+    for name, accept_gzip, warm in SCENARIOS:
+        if name not in scenarios:
+            continue
+        # cold runs get a fresh server, so its in-memory gzip cache starts empty
+        process = None
+        host, port = url if url else ('127.0.0.1', free_port())
+        if not url:
+            process = start_server(root, port)
+        try:
+            if warm:
+                asyncio.run(run_clients(host, port, plan, accept_gzip, 1, len(plan)))
+            results[name] = summarize(asyncio.run(run_clients(host, port, plan, accept_gzip, concurrency, loads)))
+        finally:
+            if process:
+                process.terminate()
+                process.wait()
+        stats = results[name]
+        print(f"✓ {name:<14} {stats['requests_per_second']:8.1f} req/s  {stats['bytes_per_second'] / 1048576:7.2f} MB/s  "
+              f"p50 {stats['latency_ms']['p50']:6.1f}ms  p95 {stats['latency_ms']['p95']:6.1f}ms  "
+              f"p99 {stats['latency_ms']['p99']:6.1f}ms  errors {stats['errors']}")
+    return {'plan': {page: len(requests) for page, requests in plan.items()}, 'scenarios': results}
+
+
+########################################################
+#       results
+########################################################
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(report: Dict, output: Optional[str]) -> str:
+    if not output:
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return output
+
+
+def compare(before_path: str, after_path: str) -> int:
+    with open(before_path, 'r', encoding='utf-8') as f:
+        before = json.load(f)
+    with open(after_path, 'r', encoding='utf-8') as f:
+        after = json.load(f)
+    print(f"👾 {before.get('commit')} → {after.get('commit')}")
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+6.1f}%" if old else '   n/a'
+
+    for name, new in after['scenarios'].items():
+        old = before['scenarios'].get(name)
+        if not old:
+            continue
+        print(f"  {name:<14} req/s {change(old['requests_per_second'], new['requests_per_second'])}  "
+              f"bytes/s {change(old['bytes_per_second'], new['bytes_per_second'])}  "
+              + '  '.join(f"{q} {change(old['latency_ms'][q], new['latency_ms'][q])}" for q in ('p50', 'p95', 'p99')))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='benchmark scripts/server.py with realistic page loads')
+    parser.add_argument('--root', default='.', help='directory to serve, relative to the repo (e.g. build)')
+    parser.add_argument('--concurrency', type=int, default=16, help='clients loading pages at the same time')
+    parser.add_argument('--loads', type=int, default=200, help='page loads per scenario')
+    parser.add_argument('--scenario', action='append', choices=[name for name, _, _ in SCENARIOS],
+                        help='run only these scenarios (default: all)')
+    parser.add_argument('--url', help='benchmark an already running server (host:port) instead of starting one')
+    parser.add_argument('--output', help=f'where to save the json results (default: {RESULTS_DIR}/<time>-<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two saved result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+
+    os.chdir(os.path.dirname(SCRIPTS_DIR))
+    url = None
+    if args.url:
+        host, _, port = args.url.rpartition(':')
+        url = (host or '127.0.0.1', int(port))
+    print(f"👾 benchmarking {args.root}/ with {args.concurrency} clients, {args.loads} page loads per scenario")
+    try:
+        results = benchmark(args.root, args.concurrency, args.loads,
+                            args.scenario or [name for name, _, _ in SCENARIOS], url)
+    except (OSError, RuntimeError) as e:
+        print(f"❌ benchmark failed: {e}")
+        return 1
+    report = {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'root': args.root,
+        'concurrency': args.concurrency,
+        'loads': args.loads,
+        **results,
+    }
+    print(f"\n✅ results saved to {save_results(report, args.output)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
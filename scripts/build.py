@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+incremental build orchestrator for loyal.love-website
+runs images, posts, rss, pages, search and precompression as a dependency graph, skips
+stages whose inputs did not change (content hashes in .cache/build-state.json),
+runs independent stages concurrently, and prints per-stage timings. images forks
+worker processes, so it runs on its own before any other stage starts
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import importlib.util
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional
+
+
+########################################################
+#       constants
+########################################################
+
+SCRIPTS_DIR: str = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE: str = '.cache/build-state.json'
+STATE_VERSION: int = 1
+BUILD_DIR: str = 'build'
+PAGE_GLOBS: List[str] = ['index.html', 'chapters/*.html']
+COPIED_ONLY: List[str] = ['rss.xml', 'sitemap.xml.gz', 'robots.txt']
+
+
+########################################################
+#       inputs and state
+########################################################
+
+def load_script(filename: str):
+    """import a script from scripts/ by file name (optimize-images.py has a dash)"""
+    name = filename[:-3].replace('-', '_')
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPTS_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def expand(patterns: List[str], exclude: Callable[[Path], bool] = None) -> List[str]:
+    files = set()
+    for pattern in patterns:
+        for path in Path('.').glob(pattern):
+            if path.is_file() and not path.name.endswith('.gz') and not (exclude and exclude(path)):
+                files.add(path.as_posix())
+    return sorted(files)
+
+
+def is_image_variant(path: Path) -> bool:
+    return path.name == 'manifest.json' or path.stem.endswith(('_optimized', '_webp', '_poster'))
+
+
+def file_hash(path: str, previous: Optional[Dict]) -> Dict:
+    """sha256 of a file, reusing the previous hash when size and mtime match"""
+    stat = os.stat(path)
+    if previous and previous.get('mtime') == stat.st_mtime and previous.get('size') == stat.st_size:
+        return previous
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': digest.hexdigest()}
+
+
+def load_state(state_path: str) -> Dict:
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') == STATE_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return {'version': STATE_VERSION, 'stages': {}}
+
+
+def save_state(state: Dict, state_path: str) -> None:
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+
+
+########################################################
+#       stages
+########################################################
+
+def run_images(changed: Optional[List[str]], build_dir: str, jobs: int) -> None:
+    """re-encode the images whose variants are older than them, only among the changed ones when known.
+    worker processes are forked, which can deadlock on a lock another thread held at fork
+    time, so when other threads are alive (the dev server's watch mode) it runs in-process"""
+    optimizer = load_script('optimize-images.py')
+    workers = jobs if threading.active_count() == 1 else 1
+    optimizer.optimize_images_in_directory('imgs', workers=workers, max_memory_mb=768, only=changed)
+
+
+def run_posts(changed: Optional[List[str]], build_dir: str, jobs: int) -> None:
+    """render the pages from posts/, the records win over edits made in the html"""
+    for page in load_script('post_store.py').render_pages():
+        print(f"✓ rendered {page} from posts/")
+
+
+def run_rss(changed: Optional[List[str]], build_dir: str, jobs: int) -> None:
+    load_script('generate_rss.py').generate_rss()
+
+
+def run_pages(changed: Optional[List[str]], build_dir: str, jobs: int) -> None:
+    """rebuild only the changed pages when nothing shared by every page changed"""
+    build_pages = load_script('build_pages.py')
+    if changed is None:
+        build_pages.build_pages(build_dir, None)
+        return
+    pages = set(expand(PAGE_GLOBS))
+    # feeds, sitemap and listings are only copied into the build, they do not affect any page
+    shared_changes = [path for path in changed if path not in pages and path not in COPIED_ONLY
+                      and not path.startswith('listings/')]
+    build_pages.build_pages(build_dir, None if shared_changes else [p for p in changed if p in pages])
+
+
+def run_search(changed: Optional[List[str]], build_dir: str, jobs: int) -> None:
+    stats = load_script('search_index.py').build_search_index(build_dir)
+    print(f"👾 search index: {stats['documents']} posts, {stats['shards']} shards, "
+          f"re-tokenized {len(stats['retokenized'])} pages")
+
+
+def run_precompress(changed: Optional[List[str]], build_dir: str, jobs: int) -> None:
+    load_script('server.py').create_gzip_files(build_dir)
+
+
+STAGES: Dict[str, Dict] = {
+    'images': {
+        'inputs': lambda: expand(['imgs/*'], is_image_variant),
+        'outputs': lambda build_dir: ['imgs/manifest.json'],
+        'deps': [],
+        'run': run_images,
+        # forks worker processes, which is only safe before the stage threads exist
+        'main_thread': True,
+    },
+    'posts': {
+        'inputs': lambda: expand(PAGE_GLOBS + ['posts/*.html']),
+        'outputs': lambda build_dir: [],
+        'deps': [],
+        'run': run_posts,
+    },
+    'rss': {
+        'inputs': lambda: expand(PAGE_GLOBS + ['posts/*.html', 'scripts/generate_rss.py',
+                                               '.github/workflows/.page-budgets.json']),
+        'outputs': lambda build_dir: ['rss.xml', 'sitemap.xml.gz'],
+        'deps': ['posts'],
+        'run': run_rss,
+    },
+    'pages': {
+        'inputs': lambda: expand(PAGE_GLOBS + ['shared/*.html', 'css/*.css', 'scripts/*.js', 'scripts/*.py',
+                                               'imgs/manifest.json', 'chapters/anchors.json', 'listings/*.json']
+                                              + COPIED_ONLY),
+        'outputs': lambda build_dir: [os.path.join(build_dir, path) for path in expand(PAGE_GLOBS)],
+        'deps': ['images', 'rss'],
+        'run': run_pages,
+    },
+    'search': {
+        'inputs': lambda: expand(['posts/*.html', 'scripts/search_index.py']),
+        'outputs': lambda build_dir: [os.path.join(build_dir, 'search', 'docs.json')],
+        'deps': ['posts'],
+        'run': run_search,
+    },
+    'precompress': {
+        'inputs': lambda: [],
+        'outputs': lambda build_dir: [os.path.join(build_dir, 'index.html.gz')],
+        'deps': ['pages', 'search'],
+        'run': run_precompress,
+    },
+}
+
+
+########################################################
+#       scheduler
+########################################################
+
+def plan_stage(name: str, state: Dict, build_dir: str, force: bool) -> Dict:
+    """hash a stage's inputs, decide which of them changed since the last build and why the stage is dirty"""
+    stage = STAGES[name]
+    previous = state['stages'].get(name, {})
+    hashes = {path: file_hash(path, previous.get(path)) for path in stage['inputs']()}
+    changed = sorted(path for path, entry in hashes.items()
+                     if previous.get(path, {}).get('hash') != entry['hash'])
+    removed = sorted(set(previous) - set(hashes))
+    missing_outputs = [path for path in stage['outputs'](build_dir) if not os.path.exists(path)]
+    if force:
+        reason = 'forced'
+    elif missing_outputs:
+        reason = 'missing outputs'
+    elif changed or removed:
+        reason = 'inputs changed'
+    else:
+        reason = None
+    return {
+        'hashes': hashes,
+        'changed': changed + removed,
+        'reason': reason,
+    }
+
+
+def build(stages: List[str], build_dir: str = BUILD_DIR, force: bool = False, jobs: int = 4,
+          state_path: str = STATE_FILE) -> bool:
+    """run the requested stages (and their dependencies) in dependency order"""
+    selected = set()
+
+    def select(name):
+        if name not in selected:
+            selected.add(name)
+            for dep in STAGES[name]['deps']:
+                select(dep)
+    for name in stages:
+        select(name)
+
+    state = load_state(state_path)
+    ran, done, failed, timings = set(), set(), set(), {}
+    pending = {name for name in STAGES if name in selected}
+    running = {}
+    started = time.perf_counter()
+
+    def prepare(name):
+        """the stage's work as a callable, or None when it is up to date"""
+        # inputs are hashed once every upstream stage finished writing them
+        plan = plan_stage(name, state, build_dir, force)
+        upstream_ran = any(dep in ran for dep in STAGES[name]['deps'])
+        if not (plan['reason'] or upstream_ran):
+            timings[name] = None
+            return None
+        reason = plan['reason'] or 'upstream changed'
+        print(f"👾 {name}: {len(plan['changed'])} changed inputs ({reason})")
+        # only a change to known inputs can be rebuilt piecemeal, anything else rebuilds everything
+        changed = plan['changed'] if reason == 'inputs changed' else None
+
+        def task():
+            t0 = time.perf_counter()
+            STAGES[name]['run'](changed, build_dir, jobs)
+            return plan, time.perf_counter() - t0
+        return task
+
+    def finish(name, result):
+        try:
+            plan, elapsed = result()
+            timings[name] = elapsed
+            state['stages'][name] = plan['hashes']
+            ran.add(name)
+            done.add(name)
+        except Exception as e:
+            print(f"❌ {name} failed: {e}")
+            failed.add(name)
+
+    # stages that fork worker processes run before any stage thread is started, so they
+    # do not overlap with the rest of the build
+    for name in sorted(pending):
+        if STAGES[name].get('main_thread') and not STAGES[name]['deps']:
+            pending.discard(name)
+            task = prepare(name)
+            if task is None:
+                done.add(name)
+            else:
+                finish(name, task)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in sorted(pending):
+                deps = STAGES[name]['deps']
+                if any(dep in failed for dep in deps if dep in selected):
+                    pending.discard(name)
+                    failed.add(name)
+                elif all(dep in done for dep in deps if dep in selected):
+                    pending.discard(name)
+                    task = prepare(name)
+                    if task is None:
+                        done.add(name)
+                    else:
+                        running[pool.submit(task)] = name
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                finish(running.pop(future), future.result)
+
+    save_state(state, state_path)
+    print("\n👾 stage timings:")
+    for name in STAGES:
+        if name in timings:
+            print(f"    {name:<12} {'skipped (up to date)' if timings[name] is None else f'{timings[name]:.2f}s'}")
+    print(f"    {'total':<12} {time.perf_counter() - started:.2f}s")
+    return not failed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='incremental build for loyal.love-website')
+    parser.add_argument('stages', nargs='*', default=list(STAGES), help=f"stages to build (default: all of {', '.join(STAGES)})")
+    parser.add_argument('--output', default=BUILD_DIR, help=f'build directory (default: {BUILD_DIR})')
+    parser.add_argument('--force', action='store_true', help='rebuild every stage regardless of the state file')
+    parser.add_argument('--jobs', type=int, default=4,
+                        help='stages to run at the same time, also the image worker processes')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        print(f"❌ unknown stages: {', '.join(unknown)}")
+        return 1
+    os.chdir(os.path.dirname(SCRIPTS_DIR))
+    ok = build(args.stages, args.output, args.force, args.jobs)
+    print("\n✅ build complete\n" if ok else "\n❌ build failed\n")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
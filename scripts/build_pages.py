@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+page build for loyal.love-website
+copies the site into an output directory and applies html transforms to the pages
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from html_utils import find_tags, get_attr, set_attr, replace_tags, resolve_local_path, relative_reference
+from minify_html import minify
+from critical_css import prepare_stylesheets, inline_critical_css
+from fingerprint import FINGERPRINT_PATTERN, fingerprint_build
+
+
+########################################################
+#       constants
+########################################################
+
+BUILD_DIR: str = 'build'
+INDEX_FILE: str = 'index.html'
+CHAPTERS_DIR: str = 'chapters'
+IMAGE_MANIFEST: str = 'imgs/manifest.json'
+# only the scripts pages load at runtime, the rest of scripts/ is build and dev tooling
+RUNTIME_SCRIPTS: List[str] = ['scripts/enhanced-lazy-load.js', 'scripts/include.js', 'scripts/search.js']
+STATIC_ENTRIES: List[str] = ['css'] + RUNTIME_SCRIPTS + ['imgs', 'shared', 'listings', 'rss.xml', 'sitemap.xml.gz',
+                                                         'robots.txt', 'chapters/anchors.json']
+STATIC_SKIP_SUFFIXES = ('.gz', '.py', '.sh', '.pyc')
+# generated already compressed, not a precompressed twin of another file
+STATIC_KEEP_NAMES = {'sitemap.xml.gz'}
+VIDEO_PATTERN = re.compile(r'<video\b.*?</video>', re.IGNORECASE | re.DOTALL)
+SHARED_DIR: str = 'shared'
+INCLUDE_CALL_PATTERN = re.compile(r'include(?P<kind>Title|Footer)\(\s*[\'"](?P<id>[^\'"]+)[\'"]')
+SCRIPT_PATTERN = re.compile(r'\s*<script\b.*?</script>', re.IGNORECASE | re.DOTALL)
+
+
+########################################################
+#       html transforms
+########################################################
+
+def inline_placeholders(html: str, page_path: str, context: Dict) -> str:
+    """inline blurred placeholders from the image manifest into <img> tags"""
+    manifest = context.get('image_manifest', {})
+    if not manifest:
+        return html
+
+    def replace(match):
+        tag = match.group(0)
+        target = resolve_local_path(get_attr(tag, 'src'), page_path)
+        entry = manifest.get(target)
+        if not entry or not entry.get('placeholder') or get_attr(tag, 'data-placeholder') is not None:
+            return tag
+        if get_attr(tag, 'width') is None and get_attr(tag, 'height') is None:
+            tag = set_attr(tag, 'width', str(entry['width']))
+            tag = set_attr(tag, 'height', str(entry['height']))
+        style = (get_attr(tag, 'style') or '').strip().rstrip(';')
+        background = f"background-image: url({entry['placeholder']}); background-size: cover"
+        tag = set_attr(tag, 'style', f'{style}; {background}' if style else background)
+        return set_attr(tag, 'data-placeholder', '')
+
+    return replace_tags(html, 'img', replace)
+
+
+def add_video_posters(html: str, page_path: str, context: Dict) -> str:
+    """give <video> tags a poster frame and preload="none" so they cost nothing until played"""
+    manifest = context.get('image_manifest', {})
+
+    def replace(match):
+        block = match.group(0)
+        tag_end = block.index('>') + 1
+        tag, body = block[:tag_end], block[tag_end:]
+        sources = [get_attr(tag, 'src')] + [get_attr(m.group(0), 'src') for m in find_tags(body, 'source')]
+        for source in sources:
+            entry = manifest.get(resolve_local_path(source, page_path))
+            if entry and entry.get('poster') and get_attr(tag, 'poster') is None:
+                tag = set_attr(tag, 'poster', relative_reference(entry['poster'], page_path))
+                break
+        if get_attr(tag, 'preload') is None:
+            tag = set_attr(tag, 'preload', 'none')
+        return tag + body
+
+    return VIDEO_PATTERN.sub(replace, html)
+
+
+def inline_shared_fragments(html: str, page_path: str, context: Dict) -> str:
+    """resolve includeTitle()/includeFooter() placeholders into static html
+
+    the include script stays on the page as a fallback; it skips any
+    element marked data-included. scripts inside a fragment are dropped,
+    as they never ran when the fragment was injected with innerHTML.
+    """
+    for match in INCLUDE_CALL_PATTERN.finditer(html):
+        fragment = context.get('fragments', {}).get(f"{match.group('kind').lower()}.html")
+        if fragment is None:
+            continue
+        element = re.compile(rf'<div\b[^>]*\bid=["\']{re.escape(match.group("id"))}["\'][^>]*>\s*</div>')
+        target = element.search(html)
+        if not target or get_attr(target.group(0), 'data-included') is not None:
+            continue
+        tag = set_attr(target.group(0)[:target.group(0).index('>') + 1], 'data-included', '')
+        html = html[:target.start()] + f"{tag}\n{fragment}\n</div>" + html[target.end():]
+    return html
+
+
+def inline_critical(html: str, page_path: str, context: Dict) -> str:
+    """inline above-the-fold css and load the purged stylesheet without blocking render"""
+    return inline_critical_css(html, page_path, context.get('stylesheets', {}))
+
+
+def minify_page(html: str, page_path: str, context: Dict) -> str:
+    """strip comments and whitespace"""
+    if not context.get('minify', True):
+        return html
+    return minify(html)
+
+
+TRANSFORMS: List[Callable[[str, str, Dict], str]] = [
+    inline_shared_fragments,
+    inline_placeholders,
+    add_video_posters,
+    inline_critical,
+    minify_page,
+]
+
+
+########################################################
+#       build
+########################################################
+
+def find_pages() -> List[str]:
+    """index.html plus every chapter page, as repo-relative paths"""
+    pages = [INDEX_FILE] if os.path.exists(INDEX_FILE) else []
+    if os.path.isdir(CHAPTERS_DIR):
+        pages.extend(sorted(f"{CHAPTERS_DIR}/{name}" for name in os.listdir(CHAPTERS_DIR) if name.endswith('.html')))
+    return pages
+
+
+def load_context(minify_pages: bool = True) -> Dict:
+    """shared inputs for the transforms"""
+    context = {'image_manifest': {}, 'fragments': {}, 'minify': minify_pages}
+    for name in ('title.html', 'footer.html'):
+        try:
+            with open(os.path.join(SHARED_DIR, name), 'r', encoding='utf-8') as f:
+                context['fragments'][name] = SCRIPT_PATTERN.sub('', f.read()).strip()
+        except OSError:
+            pass
+    try:
+        with open(IMAGE_MANIFEST, 'r', encoding='utf-8') as f:
+            context['image_manifest'] = json.load(f)
+    except (OSError, ValueError):
+        print(f"👾 no image manifest at {IMAGE_MANIFEST}, run 'make optimize-images' for placeholders")
+    return context
+
+
+def copy_static(entry: str, build_dir: str) -> int:
+    """mirror a static file or directory into the build dir, hard-linking when possible"""
+    copied = 0
+    sources = [Path(entry)] if os.path.isfile(entry) else Path(entry).rglob('*')
+    for source in sources:
+        if not source.is_file() or '__pycache__' in source.parts or (
+                source.name.endswith(STATIC_SKIP_SUFFIXES) and source.name not in STATIC_KEEP_NAMES):
+            continue
+        target = Path(build_dir) / source
+        if target.exists():
+            if target.stat().st_mtime >= source.stat().st_mtime and target.stat().st_size == source.stat().st_size:
+                continue
+            target.unlink()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+        copied += 1
+    return copied
+
+
+def prune_scripts(build_dir: str) -> int:
+    """remove tooling that older builds copied into build/scripts, fingerprinting drops its hashed copies"""
+    removed = 0
+    scripts_dir = Path(build_dir) / 'scripts'
+    if not scripts_dir.is_dir():
+        return 0
+    for path in sorted(scripts_dir.iterdir()):
+        if path.is_dir():
+            shutil.rmtree(path)
+            removed += 1
+        else:
+            name = path.relative_to(build_dir).as_posix().removesuffix('.gz')
+            if FINGERPRINT_PATTERN.search(name) or name in RUNTIME_SCRIPTS:
+                continue
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def build_page(page_path: str, build_dir: str, context: Dict) -> Tuple[int, int]:
+    """run every transform over one page and write it into the build dir"""
+    with open(page_path, 'r', encoding='utf-8') as f:
+        original = f.read()
+    html = original
+    for transform in TRANSFORMS:
+        html = transform(html, page_path, context)
+    target = Path(build_dir) / page_path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open(target, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return len(original.encode('utf-8')), len(html.encode('utf-8'))
+
+
+def build_pages(build_dir: str = BUILD_DIR, pages: List[str] = None, minify_pages: bool = True) -> None:
+    """build pages (all of them for None) into build_dir, raises when any page failed to build"""
+    context = load_context(minify_pages)
+    copied = sum(copy_static(entry, build_dir) for entry in STATIC_ENTRIES if os.path.exists(entry))
+    print(f"👾 synced {copied} static files into {build_dir}/")
+    if prune_scripts(build_dir):
+        print(f"👾 removed dev tooling from {build_dir}/scripts/")
+    context['stylesheets'] = prepare_stylesheets(find_pages(), build_dir, context['fragments'], RUNTIME_SCRIPTS)
+    for sheet, info in sorted(context['stylesheets'].items()):
+        print(f"👾 purged {sheet}: {info['original_bytes'] / 1024:.1f}kb → {info['purged_bytes'] / 1024:.1f}kb")
+    failed = []
+    for page_path in find_pages() if pages is None else pages:
+        try:
+            before, after = build_page(page_path, build_dir, context)
+            print(f"✓ {page_path}: {before / 1024:.1f}kb → {after / 1024:.1f}kb")
+        except Exception as e:
+            print(f"❌ error building {page_path}: {e}")
+            failed.append(page_path)
+    manifest = fingerprint_build(build_dir, find_pages())
+    print(f"👾 fingerprinted {len(manifest)} css/js files")
+    if failed:
+        raise RuntimeError(f"{len(failed)} pages failed to build: {', '.join(failed)}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='build the static pages into an output directory')
+    parser.add_argument('--output', default=BUILD_DIR, help=f'output directory (default: {BUILD_DIR})')
+    parser.add_argument('--no-minify', action='store_true', help='keep comments and whitespace in the output')
+    parser.add_argument('pages', nargs='*', help='pages to rebuild (default: index.html and all chapters)')
+    args = parser.parse_args()
+
+    try:
+        build_pages(args.output, args.pages or None, not args.no_minify)
+    except RuntimeError as e:
+        print(f"\n❌ {e}")
+        return 1
+    print(f"\n✅ pages built into {args.output}/")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+link and anchor checker for loyal.love-website
+reads every page, shared include, stylesheet and the rss feed once into a
+single index (files on disk, ids per page, references per source), then
+resolves every internal href/src and #anchor against it in memory, including
+the rss link/guid anchors and old index.html#post links that chapters/anchors.json
+forwards. external urls are only checked with --external, concurrently over
+pooled keep-alive connections, and good answers are cached in .cache/
+"""
+
+import os
+import re
+import sys
+import json
+import html
+import time
+import argparse
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from asset_graph import INCLUDE_PATTERN
+from html_utils import SITE_URL, resolve_local_path
+
+
+########################################################
+#       constants
+########################################################
+
+SOURCE_GLOBS: List[str] = ['index.html', 'chapters/*.html', 'shared/*.html', 'css/*.css', 'rss.xml']
+SKIPPED_DIRS = {'.git', '.cache', 'build', 'node_modules', '__pycache__', 'venv'}
+ANCHORS_FILE: str = 'chapters/anchors.json'
+CACHE_FILE: str = '.cache/external-links.json'
+CACHE_VERSION: int = 1
+IGNORED_URLS = re.compile(r'^https?://(localhost|127\.0\.0\.1)\b')
+ALIVE_STATUSES = {200, 204, 206, 301, 302, 303, 307, 308, 429}
+RETRY_WITH_GET = {403, 405, 501}
+USER_AGENT: str = 'loyal.love link checker'
+
+REFERENCE_PATTERN = re.compile(r'\s(href|src|data-src|poster|srcset|data-srcset)\s*=\s*(["\'])(.*?)\2', re.I | re.S)
+ID_PATTERN = re.compile(r'\s(?:id|name)\s*=\s*(["\'])(.*?)\1', re.I)
+HIDDEN_PATTERN = re.compile(r'<!--.*?-->|<script\b[^>]*>.*?</script\s*>', re.I | re.S)
+CSS_URL_PATTERN = re.compile(r'url\(\s*["\']?([^"\')]+)["\']?\s*\)', re.I)
+RSS_LINK_PATTERN = re.compile(r'<(link|guid)\b[^>]*>([^<]+)</\1>')
+
+
+########################################################
+#       index
+########################################################
+
+def mask(text: str) -> str:
+    """blank out comments and inline scripts, keeping offsets (and line numbers) intact"""
+    return HIDDEN_PATTERN.sub(lambda m: re.sub(r'[^\n]', ' ', m.group(0)), text)
+
+
+def line_of(text: str, offset: int) -> int:
+    return text.count('\n', 0, offset) + 1
+
+
+def source_references(source: str, text: str) -> List[Tuple[int, str]]:
+    """(line, reference) for every href/src-like value in one source"""
+    found = []
+    if source.endswith('.css'):
+        for match in CSS_URL_PATTERN.finditer(text):
+            found.append((line_of(text, match.start()), match.group(1)))
+    elif source.endswith('.xml'):
+        for match in RSS_LINK_PATTERN.finditer(text):
+            found.append((line_of(text, match.start()), html.unescape(match.group(2)).strip()))
+        unescaped = html.unescape(text)
+        for match in re.finditer(r'\ssrc\s*=\s*["\']([^"\']+)["\']', unescaped):
+            found.append((line_of(unescaped, match.start()), match.group(1)))
+    else:
+        masked = mask(text)
+        for match in REFERENCE_PATTERN.finditer(masked):
+            line, value = line_of(masked, match.start()), html.unescape(match.group(3))
+            if match.group(1).lower().endswith('srcset'):
+                found.extend((line, part.split()[0]) for part in value.split(',') if part.strip())
+            else:
+                found.append((line, value))
+    return found
+
+
+def build_index(root: str = '.') -> Dict:
+    """one pass over the site: every file, the ids of every page, the references of every source"""
+    root_path = Path(root)
+    files: Set[str] = set()
+    for directory, dirs, names in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in SKIPPED_DIRS]
+        for name in names:
+            files.add(Path(directory, name).relative_to(root_path).as_posix())
+
+    sources = sorted({p.relative_to(root_path).as_posix() for pattern in SOURCE_GLOBS for p in root_path.glob(pattern)})
+    ids: Dict[str, Set[str]] = {}
+    includes: Dict[str, Set[str]] = {}
+    references: Dict[str, List[Tuple[int, str]]] = {}
+    for source in sources:
+        text = (root_path / source).read_text(encoding='utf-8', errors='ignore')
+        references[source] = source_references(source, text)
+        if source.endswith('.html'):
+            ids[source] = {html.unescape(match.group(2)) for match in ID_PATTERN.finditer(mask(text))}
+            includes[source] = {f"shared/{match.group(1).lower()}.html" for match in INCLUDE_PATTERN.finditer(text)}
+
+    # ids of the title and footer exist on every page that includes them
+    for page, shared in includes.items():
+        for include in shared:
+            ids[page] |= ids.get(include, set())
+
+    forwarded: Dict[str, str] = {}
+    if ANCHORS_FILE in files:
+        with open(root_path / ANCHORS_FILE, 'r', encoding='utf-8') as f:
+            forwarded = {post_id: f"chapters/{chapter}" for post_id, chapter in json.load(f).items()}
+    return {'files': files, 'ids': ids, 'references': references, 'forwarded': forwarded}
+
+
+########################################################
+#       internal links
+########################################################
+
+def check_internal(index: Dict, source: str, reference: str) -> Optional[str]:
+    """None when reference resolves, otherwise why it does not"""
+    path = reference.split('#', 1)[0]
+    if not path:
+        target = source
+    elif path.rstrip('/') == '' or path.endswith('/'):
+        target = (resolve_local_path(path, source) or '').rstrip('/')
+        target = f"{target}/index.html" if target else 'index.html'
+    else:
+        target = resolve_local_path(reference, source)
+    if target not in index['files'] and f"{target}/index.html" in index['files']:
+        target = f"{target}/index.html"
+    if target not in index['files']:
+        return f"missing file {target}"
+
+    fragment = reference.split('#', 1)[1] if '#' in reference else ''
+    if not fragment or fragment == 'top' or target not in index['ids']:
+        return None
+    if fragment in index['ids'][target]:
+        return None
+    moved_to = index['forwarded'].get(fragment)
+    if target == 'index.html' and moved_to and fragment in index['ids'].get(moved_to, set()):
+        return None
+    return f"no #{fragment} in {target}"
+
+
+def site_reference(reference: str) -> str:
+    """absolute loyal.love urls are checked like internal ones, https://loyal.love#x is /#x"""
+    for prefix in (SITE_URL, SITE_URL.replace('https://', 'https://www.'), SITE_URL.replace('https://', 'http://')):
+        if reference.startswith(prefix):
+            return '/' + reference[len(prefix):].lstrip('/')
+    return reference
+
+
+########################################################
+#       external links
+########################################################
+
+class ConnectionPool:
+    """one keep-alive connection per (thread, host), so a page of links to one site reuses it"""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.local = threading.local()
+        self.opened: List[http.client.HTTPConnection] = []
+        self.lock = threading.Lock()
+
+    def connection(self, scheme: str, host: str) -> http.client.HTTPConnection:
+        connections = self.local.__dict__.setdefault('connections', {})
+        if (scheme, host) not in connections:
+            factory = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            connections[(scheme, host)] = factory(host, timeout=self.timeout)
+            with self.lock:
+                self.opened.append(connections[(scheme, host)])
+        return connections[(scheme, host)]
+
+    def close(self) -> None:
+        with self.lock:
+            for conn in self.opened:
+                conn.close()
+            self.opened.clear()
+
+    def request(self, method: str, url: str) -> int:
+        parts = urlsplit(url)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        for attempt in range(2):
+            conn = self.connection(parts.scheme, parts.netloc)
+            try:
+                conn.request(method, path, headers={'User-Agent': USER_AGENT, 'Accept': '*/*'})
+                response = conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, ConnectionError):
+                # the server closed a kept-alive connection, open a fresh one once
+                conn.close()
+                self.local.connections.pop((parts.scheme, parts.netloc), None)
+                if attempt:
+                    raise
+        return 0
+
+
+def load_cache(cache_path: str) -> Dict:
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'version': CACHE_VERSION, 'urls': {}}
+
+
+def check_external(urls: List[str], jobs: int, timeout: float, max_age: float,
+                   cache_path: str = CACHE_FILE) -> Dict[str, str]:
+    """{url: error} for the urls that did not answer, good answers younger than max_age are reused"""
+    cache = load_cache(cache_path)
+    now = time.time()
+    pending = [url for url in urls if now - cache['urls'].get(url, {}).get('checked', 0) > max_age]
+    pool = ConnectionPool(timeout)
+
+    def check(url):
+        try:
+            status = pool.request('HEAD', url)
+            if status in RETRY_WITH_GET:
+                status = pool.request('GET', url)
+            return url, None if status in ALIVE_STATUSES else f"http {status}"
+        except (OSError, http.client.HTTPException) as e:
+            return url, str(e) or type(e).__name__
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = dict(executor.map(check, pending))
+    pool.close()
+    for url, error in results.items():
+        if error:
+            cache['urls'].pop(url, None)
+        else:
+            cache['urls'][url] = {'checked': now}
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    print(f"👾 checked {len(pending)} external urls ({len(urls) - len(pending)} cached)")
+    return {url: error for url, error in results.items() if error}
+
+
+########################################################
+#       report
+########################################################
+
+def check_links(index: Dict) -> Tuple[List[Tuple[str, int, str, str]], Dict[str, List[Tuple[str, int]]]]:
+    """(source, line, reference, problem) for broken internal links, and {external url: [(source, line)]}"""
+    broken, external = [], {}
+    for source, references in index['references'].items():
+        for line, original in references:
+            reference = site_reference(original.strip())
+            if not reference or re.match(r'^(?!https?:)[a-z][a-z0-9+.-]*:', reference, re.I):
+                continue
+            if re.match(r'^https?://', reference):
+                if not IGNORED_URLS.match(reference):
+                    external.setdefault(reference.split('#', 1)[0], []).append((source, line))
+                continue
+            problem = check_internal(index, source, reference)
+            if problem:
+                broken.append((source, line, original, problem))
+    return broken, external
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='check every internal link and anchor (and optionally external urls)')
+    parser.add_argument('--root', default='.', help='site to check, relative to the repo (e.g. build)')
+    parser.add_argument('--external', action='store_true', help='also check external urls over the network')
+    parser.add_argument('--jobs', type=int, default=16, help='concurrent external checks')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds per external request')
+    parser.add_argument('--max-age-days', type=float, default=7.0,
+                        help='reuse external results younger than this from the cache')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    index = build_index(args.root)
+    broken, external = check_links(index)
+    total = sum(len(references) for references in index['references'].values())
+    print(f"👾 indexed {len(index['files'])} files, {sum(len(ids) for ids in index['ids'].values())} ids, "
+          f"{total} references in {len(index['references'])} sources")
+
+    for source, line, reference, problem in broken:
+        print(f"❌ {source}:{line} → {reference} ({problem})")
+    failed = bool(broken)
+
+    if args.external:
+        errors = check_external(sorted(external), args.jobs, args.timeout, args.max_age_days * 86400)
+        for url, error in sorted(errors.items()):
+            where = ', '.join(f"{source}:{line}" for source, line in external[url][:3])
+            print(f"❌ {url} ({error}) in {where}")
+        failed = failed or bool(errors)
+
+    if failed:
+        return 1
+    print(f"✅ every link resolves ({len(external)} external urls {'checked' if args.external else 'skipped'})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
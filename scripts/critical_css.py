@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+critical css extraction and unused-rule purging for loyal.love-website
+purges each stylesheet against the classes, ids and tags of the pages that
+link it, inlines the rules used above the fold into <head>, and loads the
+purged stylesheet without blocking render
+"""
+
+import os
+import re
+import sys
+import argparse
+from pathlib import Path
+from typing import Dict, List, Set
+
+from html_utils import find_tags, get_attr, set_attr, replace_tags, resolve_local_path, relative_reference
+
+
+########################################################
+#       constants
+########################################################
+
+ALWAYS_KEEP_TAGS = {'html', 'body', '*'}
+KEEP_WHOLE_AT_RULES = ('@font-face', '@keyframes', '@-webkit-keyframes', '@page', '@import', '@charset')
+# the first post is what renders before the visitor scrolls
+ABOVE_THE_FOLD_MARKER = re.compile(r'<hr\b[^>]*class=["\'][^"\']*between-posts', re.IGNORECASE)
+ABOVE_THE_FOLD_BYTES: int = 16384
+PURGED_SUFFIX: str = '.purged.css'
+
+
+########################################################
+#       css parsing
+########################################################
+
+def parse_css(css: str) -> List[Dict]:
+    """parse css into rules ({selectors, body}) and at-rules ({prelude, children|body})"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    items, position = [], 0
+    while position < len(css):
+        brace = css.find('{', position)
+        semicolon = css.find(';', position)
+        if brace == -1:
+            break
+        if semicolon != -1 and semicolon < brace and css[position:semicolon].strip().startswith('@'):
+            items.append({'prelude': css[position:semicolon].strip(), 'body': None})
+            position = semicolon + 1
+            continue
+        prelude = css[position:brace].strip()
+        depth, end = 1, brace + 1
+        while end < len(css) and depth:
+            depth += {'{': 1, '}': -1}.get(css[end], 0)
+            end += 1
+        body = css[brace + 1:end - 1]
+        if prelude.startswith('@') and not prelude.startswith(KEEP_WHOLE_AT_RULES):
+            items.append({'prelude': prelude, 'children': parse_css(body)})
+        elif prelude.startswith('@'):
+            items.append({'prelude': prelude, 'body': body})
+        elif prelude:
+            items.append({'selectors': [s.strip() for s in prelude.split(',') if s.strip()], 'body': body})
+        position = end
+    return items
+
+
+def serialize_css(items: List[Dict]) -> str:
+    out = []
+    for item in items:
+        if 'selectors' in item:
+            out.append(f"{','.join(item['selectors'])}{{{' '.join(item['body'].split())}}}")
+        elif 'children' in item:
+            out.append(f"{item['prelude']}{{{serialize_css(item['children'])}}}")
+        elif item['body'] is None:
+            out.append(f"{item['prelude']};")
+        else:
+            out.append(f"{item['prelude']}{{{' '.join(item['body'].split())}}}")
+    return ''.join(out)
+
+
+########################################################
+#       matching
+########################################################
+
+def html_tokens(html: str) -> Set[str]:
+    """'.class', '#id' and tag tokens present in an html document"""
+    tokens = set(ALWAYS_KEEP_TAGS)
+    for match in re.finditer(r'<([a-zA-Z][a-zA-Z0-9]*)\b([^>]*)>', html):
+        tokens.add(match.group(1).lower())
+        attrs = match.group(0)
+        for name in (get_attr(attrs, 'class') or '').split():
+            tokens.add(f'.{name}')
+        element_id = get_attr(attrs, 'id')
+        if element_id:
+            tokens.add(f'#{element_id}')
+    return tokens
+
+
+def script_tokens(scripts: List[str]) -> Set[str]:
+    """class names the page scripts may add at runtime (every quoted identifier, to stay safe)"""
+    tokens = set()
+    for script in scripts:
+        if not os.path.exists(script):
+            continue
+        for literal in re.findall(r'[\'"`]([a-zA-Z][\w-]*)[\'"`]', Path(script).read_text(encoding='utf-8')):
+            tokens.add(f'.{literal}')
+            tokens.add(f'#{literal}')
+    return tokens
+
+
+def selector_matches(selector: str, tokens: Set[str]) -> bool:
+    """true unless the selector needs a class, id or tag the page does not have"""
+    stripped = re.sub(r'\[[^\]]*\]', '', selector)
+    stripped = re.sub(r'::?[a-zA-Z-]+(\([^)]*\))?', '', stripped)
+    for token in re.findall(r'[.#][\w-]+', stripped):
+        if token not in tokens:
+            return False
+    for tag in re.findall(r'(?:^|[\s>+~])([a-zA-Z][\w-]*)', stripped):
+        if tag.lower() not in tokens:
+            return False
+    return True
+
+
+def purge(items: List[Dict], tokens: Set[str]) -> List[Dict]:
+    """keep only rules with at least one selector that can match"""
+    kept = []
+    for item in items:
+        if 'selectors' in item:
+            selectors = [s for s in item['selectors'] if selector_matches(s, tokens)]
+            if selectors:
+                kept.append({'selectors': selectors, 'body': item['body']})
+        elif 'children' in item:
+            children = purge(item['children'], tokens)
+            if children:
+                kept.append({'prelude': item['prelude'], 'children': children})
+        else:
+            kept.append(item)
+    return kept
+
+
+def critical_only(items: List[Dict], tokens: Set[str]) -> List[Dict]:
+    """rules needed above the fold; keyframes and fonts load with the full sheet"""
+    return [item for item in purge(items, tokens) if 'selectors' in item or 'children' in item]
+
+
+def above_the_fold(html: str) -> str:
+    """the head plus the body up to the end of the first post"""
+    markers = [m.start() for m in ABOVE_THE_FOLD_MARKER.finditer(html)]
+    end = markers[1] if len(markers) > 1 else len(html)
+    body_start = html.lower().find('<body')
+    return html[:min(end, max(body_start, 0) + ABOVE_THE_FOLD_BYTES)]
+
+
+########################################################
+#       build integration
+########################################################
+
+def stylesheet_links(html: str, page_path: str) -> List[str]:
+    """repo paths of the stylesheets a page links"""
+    sheets = []
+    for match in find_tags(html, 'link'):
+        if (get_attr(match.group(0), 'rel') or '').lower() == 'stylesheet':
+            path = resolve_local_path(get_attr(match.group(0), 'href'), page_path)
+            if path and path.endswith('.css'):
+                sheets.append(path)
+    return sheets
+
+
+def purged_path(stylesheet: str) -> str:
+    return stylesheet[:-len('.css')] + PURGED_SUFFIX
+
+
+def prepare_stylesheets(pages: List[str], build_dir: str, fragments: Dict[str, str],
+                        scripts: List[str]) -> Dict[str, Dict]:
+    """purge every linked stylesheet against its page family and write it into the build dir
+
+    the purged sheet also keeps what the runtime scripts and the shared
+    fragments may need, those rules are never part of the critical block
+    """
+    families: Dict[str, Set[str]] = {}
+    extra = script_tokens(scripts)
+    for fragment in fragments.values():
+        extra |= html_tokens(fragment)
+    for page in pages:
+        with open(page, 'r', encoding='utf-8') as f:
+            html = f.read()
+        for sheet in stylesheet_links(html, page):
+            families.setdefault(sheet, set(extra)).update(html_tokens(html))
+
+    stylesheets = {}
+    for sheet, tokens in families.items():
+        if not os.path.exists(sheet):
+            continue
+        with open(sheet, 'r', encoding='utf-8') as f:
+            original = f.read()
+        items = parse_css(original)
+        purged = serialize_css(purge(items, tokens))
+        target = Path(build_dir) / purged_path(sheet)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(purged, encoding='utf-8')
+        stylesheets[sheet] = {
+            'items': items,
+            'original_bytes': len(original.encode('utf-8')),
+            'purged_bytes': len(purged.encode('utf-8')),
+        }
+    return stylesheets
+
+
+def inline_critical_css(html: str, page_path: str, stylesheets: Dict[str, Dict]) -> str:
+    """inline above-the-fold rules and load the purged stylesheet asynchronously
+
+    the critical rules go where the stylesheet link was, before the async link,
+    so they keep the sheet's place in the cascade instead of following it. the
+    async link is the preload, so a separate preload of the same sheet is dropped
+    """
+    fold_tokens = html_tokens(above_the_fold(html))
+
+    def replace(match):
+        tag = match.group(0)
+        sheet = resolve_local_path(get_attr(tag, 'href'), page_path)
+        if sheet not in stylesheets:
+            return tag
+        href = relative_reference(purged_path(sheet), page_path)
+        if (get_attr(tag, 'rel') or '').lower() == 'preload':
+            return ''
+        critical = serialize_css(critical_only(stylesheets[sheet]['items'], fold_tokens))
+        preload = set_attr(set_attr(tag, 'rel', 'preload'), 'href', href)
+        preload = set_attr(set_attr(preload, 'as', 'style'), 'onload', "this.onload=null;this.rel='stylesheet'")
+        block = f"<style>{critical}</style>" if critical else ''
+        return f"{block}{preload}<noscript>{set_attr(tag, 'href', href)}</noscript>"
+
+    return replace_tags(html, 'link', replace)
+
+
+########################################################
+#       cli
+########################################################
+
+def report(pages: List[str], build_dir: str, fragments: Dict[str, str], scripts: List[str]) -> int:
+    stylesheets = prepare_stylesheets(pages, build_dir, fragments, scripts)
+    for sheet, info in sorted(stylesheets.items()):
+        removed = info['original_bytes'] - info['purged_bytes']
+        print(f"✓ {sheet}: {info['original_bytes'] / 1024:.1f}kb → {info['purged_bytes'] / 1024:.1f}kb "
+              f"(removed {removed / 1024:.1f}kb, {100 * removed / max(info['original_bytes'], 1):.0f}%)")
+    for page in pages:
+        with open(page, 'r', encoding='utf-8') as f:
+            html = f.read()
+        critical = re.findall(r'<style>(.*?)</style><link\b', inline_critical_css(html, page, stylesheets), re.DOTALL)
+        if critical:
+            print(f"  {page}: {sum(len(rules.encode('utf-8')) for rules in critical) / 1024:.1f}kb critical css inlined")
+    return 0
+
+
+def main() -> int:
+    from build_pages import BUILD_DIR, RUNTIME_SCRIPTS, find_pages, load_context
+
+    parser = argparse.ArgumentParser(description='report purged and critical css per page family')
+    parser.add_argument('--output', default=BUILD_DIR, help=f'where purged stylesheets go (default: {BUILD_DIR})')
+    args = parser.parse_args()
+    return report(find_pages(), args.output, load_context()['fragments'], RUNTIME_SCRIPTS)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -98,6 +98,7 @@ class EnhancedLazyLoader {
         
         webpImg.onload = () => {
             img.src = webpSrc;
+            this.clearPlaceholder(img);
             img.classList.add('loaded');
             img.classList.remove('loading');
         };
@@ -116,6 +117,7 @@ class EnhancedLazyLoader {
         // add a small delay to prevent overwhelming the browser
         setTimeout(() => {
             img.onload = () => {
+                this.clearPlaceholder(img);
                 img.classList.add('loaded');
                 img.classList.remove('loading');
             };
@@ -133,6 +135,14 @@ class EnhancedLazyLoader {
         }, Math.random() * 100); // random delay to prevent thundering herd
     }
 
+    clearPlaceholder(img) {
+        // drop the build-time blurred placeholder once the real image is in
+        if (img.hasAttribute('data-placeholder')) {
+            img.style.backgroundImage = '';
+            img.removeAttribute('data-placeholder');
+        }
+    }
+
     preloadCriticalImages() {
         // preload first 3 images for better perceived performance
         const criticalImages = Array.from(this.images).slice(0, 3);
@@ -214,6 +224,10 @@ style.textContent = `
     img[loading="lazy"].loading {
         opacity: 0.3;
     }
+
+    img[loading="lazy"][data-placeholder] {
+        opacity: 1;
+    }
     
     img[loading="lazy"].error {
         opacity: 0.5;
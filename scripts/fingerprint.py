@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+content-hashed asset fingerprinting for loyal.love-website
+copies css/js in the build dir to name.<hash>.ext, rewrites the references in
+the built html and the root-relative ones in scripts, and writes
+asset-manifest.json so they can be cached forever
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+from html_utils import get_attr, set_attr, replace_tags, resolve_local_path, relative_reference
+
+
+########################################################
+#       constants
+########################################################
+
+FINGERPRINT_GLOBS: List[str] = ['css/*.css', 'scripts/*.js']
+FINGERPRINT_PATTERN = re.compile(r'\.[0-9a-f]{10}\.[a-z0-9]+$')
+MANIFEST_FILE: str = 'asset-manifest.json'
+HASH_LENGTH: int = 10
+REFERENCE_ATTRS = {'link': 'href', 'script': 'src'}
+# '/scripts/search.js' as a string literal, scripts that load other assets at runtime
+SCRIPT_REFERENCE_PATTERN = re.compile(r'([\'"`])/((?:css|scripts)/[\w.-]+)\1')
+
+
+########################################################
+#       fingerprinting
+########################################################
+
+def hashed_name(path: Path, data: bytes) -> Path:
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    return path.with_name(f"{path.stem}.{digest}{path.suffix}")
+
+
+def script_references(data: bytes) -> List[str]:
+    """repo paths of the assets a script names as '/path' string literals"""
+    return [match.group(2) for match in SCRIPT_REFERENCE_PATTERN.finditer(data.decode('utf-8', 'ignore'))]
+
+
+def rewrite_script_references(data: bytes, manifest: Dict[str, str]) -> bytes:
+    """point '/scripts/x.js' literals at the fingerprinted files"""
+    def replace(match):
+        quote, target = match.groups()
+        return f"{quote}/{manifest.get(target, target)}{quote}"
+    return SCRIPT_REFERENCE_PATTERN.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+
+def fingerprint_assets(build_dir: str) -> Dict[str, str]:
+    """write hashed copies of every css/js file, returns {original: hashed} repo paths"""
+    root = Path(build_dir)
+    sources = {}
+    for pattern in FINGERPRINT_GLOBS:
+        for path in sorted(root.glob(pattern)):
+            if not FINGERPRINT_PATTERN.search(path.name):
+                sources[path] = path.read_bytes()
+
+    # scripts that load other assets are hashed last, with those references rewritten,
+    # so their hash changes along with the assets they load (one level deep)
+    manifest = {}
+    for path in sorted(sources, key=lambda path: path.suffix == '.js' and bool(script_references(sources[path]))):
+        data = sources[path]
+        if path.suffix == '.js':
+            data = rewrite_script_references(data, manifest)
+        target = hashed_name(path, data)
+        if not target.exists():
+            target.write_bytes(data)
+        manifest[path.relative_to(root).as_posix()] = target.relative_to(root).as_posix()
+
+    current = set(manifest.values())
+    for pattern in FINGERPRINT_GLOBS:
+        for path in root.glob(pattern):
+            if FINGERPRINT_PATTERN.search(path.name) and path.relative_to(root).as_posix() not in current:
+                path.unlink()
+                gz_path = path.with_name(path.name + '.gz')
+                if gz_path.exists():
+                    gz_path.unlink()
+    return manifest
+
+
+def unhashed(path: str) -> str:
+    """css/style_v1.d1dca72efc.css -> css/style_v1.css"""
+    match = FINGERPRINT_PATTERN.search(path)
+    return path[:match.start()] + path[match.start() + HASH_LENGTH + 1:] if match else path
+
+
+def rewrite_references(html: str, page_path: str, manifest: Dict[str, str]) -> str:
+    """point <link href> and <script src> at the fingerprinted files
+
+    references that are already fingerprinted (pages left over from an
+    earlier incremental build) are moved to the current hash.
+    """
+    for tag_name, attr in REFERENCE_ATTRS.items():
+        def replace(match, attr=attr):
+            tag = match.group(0)
+            target = resolve_local_path(get_attr(tag, attr), page_path)
+            target = unhashed(target) if target else target
+            if target in manifest:
+                return set_attr(tag, attr, relative_reference(manifest[target], page_path))
+            return tag
+        html = replace_tags(html, tag_name, replace)
+    return html
+
+
+def fingerprint_build(build_dir: str, pages: List[str]) -> Dict[str, str]:
+    """fingerprint assets and rewrite every built html file that references them"""
+    manifest = fingerprint_assets(build_dir)
+    root = Path(build_dir)
+    html_files = set(pages) | {p.relative_to(root).as_posix() for p in root.glob('shared/*.html')}
+    for page in sorted(html_files):
+        target = root / page
+        if not target.exists():
+            continue
+        html = target.read_text(encoding='utf-8')
+        rewritten = rewrite_references(html, page, manifest)
+        if rewritten != html:
+            # shared/ is hard-linked to the sources, never write through the link
+            target.unlink()
+            target.write_text(rewritten, encoding='utf-8')
+    with open(root / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return manifest
+
+
+def main() -> int:
+    from build_pages import BUILD_DIR, find_pages
+
+    parser = argparse.ArgumentParser(description='fingerprint css/js in the build dir')
+    parser.add_argument('--output', default=BUILD_DIR, help=f'build directory (default: {BUILD_DIR})')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.output):
+        print(f"❌ {args.output} does not exist, run 'make build' first")
+        return 1
+    manifest = fingerprint_build(args.output, find_pages())
+    for original, hashed in sorted(manifest.items()):
+        print(f"✓ {original} → {hashed}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
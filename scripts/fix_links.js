@@ -2,18 +2,25 @@
 
 import fs from 'fs';
 import path from 'path';
+import { fileURLToPath } from 'url';
 
 
-function fixLinks(htmlContent, filePath) {
+// root-relative links and other schemes (mailto:, tel:) are left alone
+function isRewritable(reference) {
+    return !reference.startsWith('/') && !/^[a-z][a-z0-9+.-]*:/i.test(reference);
+}
+
+// baseDir is what links are made relative to, scripts/lint_worker.js passes the file's own directory
+export function fixLinks(htmlContent, filePath, baseDir = process.cwd()) {
 
     let fixedContent = htmlContent.replace(
         /href="(?!https?:\/\/)([^"]+)"/g,
         (match, href) => {
-            if (href.startsWith('data:') || href.startsWith('#')) {
+            if (href.startsWith('data:') || href.startsWith('#') || !isRewritable(href)) {
                 return match;
             }
             const absolutePath = path.resolve(path.dirname(filePath), href);
-            const relativePath = path.relative(process.cwd(), absolutePath);
+            const relativePath = path.relative(baseDir, absolutePath);
             return `href="${relativePath}"`;
         }
     );
@@ -21,11 +28,11 @@ function fixLinks(htmlContent, filePath) {
     fixedContent = fixedContent.replace(
         /src="(?!https?:\/\/)([^"]+)"/g,
         (match, src) => {
-            if (src.startsWith('data:')) {
+            if (src.startsWith('data:') || !isRewritable(src)) {
                 return match;
             }
             const absolutePath = path.resolve(path.dirname(filePath), src);
-            const relativePath = path.relative(process.cwd(), absolutePath);
+            const relativePath = path.relative(baseDir, absolutePath);
             return `src="${relativePath}"`;
         }
     );
@@ -50,4 +57,6 @@ function processFiles() {
     });
 }
 
-processFiles();
+if (process.argv[1] === fileURLToPath(import.meta.url)) {
+    processFiles();
+}
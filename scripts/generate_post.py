@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 
+import re
+import argparse
 import datetime
-from typing import Optional
+from typing import Dict, Optional
+
+from instrument import add_profile_argument, profile, span
+from post_store import add_post
 
 
 def generate_post_id(date: datetime.date) -> str:
@@ -62,30 +67,33 @@ def generate_post_html(
     return html
 
 
-def insert_post_into_index(html_content: str, index_path: str = "index.html") -> None:
-    """Insert the new post HTML at the top of the posts section in index.html"""
-
-    with open(index_path, 'r') as f:
-        content = f.read()
-    
-    insert_position = content.find('</div>\n    <script>\n      includeTitle(\'shared-title\')\n    </script>')
-    if insert_position == -1:
-        raise ValueError("Could not find the insertion point in index.html")
-    
-    new_content = content[:insert_position + len('</div>\n    <script>\n      includeTitle(\'shared-title\')\n    </script>')] + \
-                 '\n\n    <!-- ............................................................................................................................................... -->\n' + \
-                 '    <!-- .......................................       POST       ....................................................................................... -->\n' + \
-                 '    <!-- ............................................................................................................................................... -->\n\n' + \
-                 html_content + \
-                 '\n\n    <!-- .........................................................       END        ................................................................... -->\n\n' + \
-                 content[insert_position + len('</div>\n    <script>\n      includeTitle(\'shared-title\')\n    </script>'):]
-    
-    with open(index_path, 'w') as f:
-        f.write(new_content)
+def post_record(
+    location: str,
+    date: datetime.date,
+    astro_status: str,
+    main_content: str,
+    main_image: str,
+    post_side: str,
+) -> Dict:
+    """the front matter the post store keeps next to the post's html"""
+    return {
+        'id': generate_post_id(date),
+        'date': date,
+        'location': location,
+        'side': post_side,
+        'astro_status': astro_status,
+        'title': f"{location}; {date.year}, {date.strftime('%B').lower()}, {date.day}",
+        'description': ' '.join(re.sub(r'<[^>]+>', ' ', main_content).split()),
+        'image': main_image,
+    }
 
 
 def main():
 
+    parser = argparse.ArgumentParser(description='write a new post onto index.html')
+    add_profile_argument(parser)
+    profile(parser.parse_args().profile, 'generate_post')
+
     today = datetime.date.today()
     
     location = input("\n👾 enter location: ")
@@ -97,21 +105,25 @@ def main():
     meanwhile_image = input("👾 enter meanwhile image path: ")
     post_side = input("👾 enter post side (left/right): ")
     
-    post_html = generate_post_html(
-        location=location,
-        date=today,
-        astro_status=astro_status,
-        main_content=main_content,
-        main_image=main_image,
-        post_side=post_side,
-        meanwhile_title=meanwhile_title,
-        meanwhile_content=meanwhile_content,
-        meanwhile_image=meanwhile_image,
-    )
+    with span('render post'):
+        post_html = generate_post_html(
+            location=location,
+            date=today,
+            astro_status=astro_status,
+            main_content=main_content,
+            main_image=main_image,
+            post_side=post_side,
+            meanwhile_title=meanwhile_title,
+            meanwhile_content=meanwhile_content,
+            meanwhile_image=meanwhile_image,
+        )
+    
+    record = post_record(location, today, astro_status, main_content, main_image, post_side)
     
     try:
-        insert_post_into_index(post_html)
-        print("\n✅ post successfully added to index.html!\n")
+        with span('add post'):
+            path = add_post(post_html, record)
+        print(f"\n✅ post saved to {path} and rendered into index.html!\n")
     except Exception as e:
         print(f"❌ error adding post: {e}")
 
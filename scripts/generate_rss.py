@@ -2,11 +2,18 @@
 
 import os
 import re
+import json
+import gzip
 from datetime import datetime, timezone
-from typing import Dict, List
+from typing import Dict, List, Optional
 from bs4 import BeautifulSoup
 import xml.etree.ElementTree as ET
 
+from html_utils import resolve_local_path
+from instrument import add_profile_argument, profile, span
+from post_store import find_pages, load_posts
+from validate_rss import BUDGET_CONFIG, load_budget
+
 
 ########################################################
 #       constants
@@ -28,6 +35,9 @@ MONTH_MAP: Dict[str, str] = {
 CHAPTERS_DIR: str = 'chapters'
 INDEX_FILE: str = 'index.html'
 RSS_OUTPUT_FILE: str = 'rss.xml'
+SITEMAP_OUTPUT_FILE: str = 'sitemap.xml.gz'
+LISTINGS_DIR: str = 'listings'
+SITEMAP_NAMESPACE: str = 'http://www.sitemaps.org/schemas/sitemap/0.9'
 
 
 ########################################################
@@ -98,33 +108,102 @@ def extract_post_data(html_content: str, chapter_name: str = '') -> List[Dict[st
     return posts
 
 
+def record_to_item(post: Dict) -> Dict:
+    """an rss item from a post store record, shaped like extract_post_data's"""
+    page = post['page']
+    link = f"{RSS_CONFIG['link']}#{post['id']}" if page == INDEX_FILE else f"{RSS_CONFIG['link']}/{page}#{post['id']}"
+    return {
+        'title': post.get('title', ''),
+        'description': post.get('description', ''),
+        'link': link,
+        'guid': link,
+        'pubDate': datetime(post['date'].year, post['date'].month, post['date'].day, tzinfo=timezone.utc),
+        'image': post.get('image') or None,
+    }
+
+
+def page_url(page: str) -> str:
+    return f"{RSS_CONFIG['link']}/" if page == INDEX_FILE else f"{RSS_CONFIG['link']}/{page}"
+
+
+def write_if_changed(path: str, data: bytes) -> bool:
+    """keep generated files untouched when nothing changed, so git and caches stay quiet"""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def generate_sitemap(records: List[Dict]) -> None:
+    """sitemap.xml.gz with one url per page, lastmod from its newest post"""
+    newest: Dict[str, datetime] = {}
+    for post in records:
+        if post['date'] and (post['page'] not in newest or post['date'] > newest[post['page']]):
+            newest[post['page']] = post['date']
+
+    urlset = ET.Element("urlset", xmlns=SITEMAP_NAMESPACE)
+    for page in sorted(find_pages(), key=lambda page: page != INDEX_FILE):
+        url = ET.SubElement(urlset, "url")
+        ET.SubElement(url, "loc").text = page_url(page)
+        if page in newest:
+            ET.SubElement(url, "lastmod").text = newest[page].isoformat()
+
+    xml_str = '<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(urlset, encoding='unicode') + '\n'
+    # mtime=0 keeps the archive identical between runs with the same pages
+    if write_if_changed(SITEMAP_OUTPUT_FILE, gzip.compress(xml_str.encode('utf-8'), compresslevel=9, mtime=0)):
+        print(f"✅ successfully generated sitemap: {SITEMAP_OUTPUT_FILE}")
+
+
+def image_url(image: str, page: str) -> Optional[str]:
+    if not image:
+        return None
+    path = resolve_local_path(image, page)
+    return f"{RSS_CONFIG['link']}/{path}" if path else image
+
+
+def generate_listings(records: List[Dict]) -> None:
+    """listings/<page>.json with the title, date, link and image of every post on a page"""
+    for page in find_pages():
+        posts = [post for post in records if post['page'] == page]
+        listing = {
+            'page': page,
+            'url': page_url(page),
+            'posts': [{
+                'id': post['id'],
+                'title': post.get('title', ''),
+                'date': post['date'].isoformat() if post['date'] else '',
+                'url': record_to_item(post)['link'] if post['date'] else f"{page_url(page)}#{post['id']}",
+                'image': image_url(post.get('image'), page),
+            } for post in posts],
+        }
+        path = os.path.join(LISTINGS_DIR, f"{os.path.splitext(os.path.basename(page))[0]}.json")
+        if write_if_changed(path, (json.dumps(listing, indent=2, ensure_ascii=False) + '\n').encode('utf-8')):
+            print(f"✅ successfully generated listing: {path}")
+
+
 def generate_rss() -> None:
 
     current_time = datetime.now(timezone.utc)
     all_posts = []
-
-    if os.path.exists(INDEX_FILE):
-        try:
-            with open(INDEX_FILE, 'r', encoding='utf-8') as f:
-                posts = extract_post_data(f.read())
-                all_posts.extend(posts)
-        except Exception as e:
-            print(f"❌  error processing {INDEX_FILE}: {e}")
+    records = []
 
     try:
-        for filename in os.listdir(CHAPTERS_DIR):
-            if filename.endswith('.html'):
-                file_path = os.path.join(CHAPTERS_DIR, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        posts = extract_post_data(f.read(), filename)
-                        all_posts.extend(posts)
-                except Exception as e:
-                    print(f"❌ error processing {file_path}: {e}")
+        with span('load posts'):
+            records = load_posts()
+        all_posts = [record_to_item(post) for post in records if post['date']]
     except Exception as e:
-        print(f"❌ error accessing {CHAPTERS_DIR}: {e}")
-    
+        print(f"❌ error loading posts: {e}")
+
     all_posts.sort(key=lambda x: x['pubDate'], reverse=True)
+    # the feed carries the newest posts up to the budget validate_rss enforces
+    max_items = load_budget(BUDGET_CONFIG)['items']
+    if len(all_posts) > max_items:
+        print(f"👾 feed keeps the newest {max_items} of {len(all_posts)} posts")
+        all_posts = all_posts[:max_items]
     rss = ET.Element("rss", version="2.0")
     rss.set("xmlns:atom", "http://www.w3.org/2005/Atom")
     rss.set("xmlns:content", "http://purl.org/rss/1.0/modules/content/")
@@ -158,15 +237,30 @@ def generate_rss() -> None:
         ET.SubElement(item, "pubDate").text = post['pubDate'].strftime("%a, %d %b %Y %H:%M:%S %z")
 
     xml_str = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml_str += ET.tostring(rss, encoding='unicode')
+    with span('serialize rss', items=len(all_posts)):
+        xml_str += ET.tostring(rss, encoding='unicode')
 
     try:
-        with open(RSS_OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        with span('write rss'), open(RSS_OUTPUT_FILE, 'w', encoding='utf-8') as f:
             f.write(xml_str)
         print(f"✅ successfully generated RSS feed: {RSS_OUTPUT_FILE}")
     except Exception as e:
         print(f"❌ error writing {RSS_OUTPUT_FILE}: {e}")
 
+    # the same post list feeds the sitemap and the per-page listings
+    try:
+        with span('sitemap'):
+            generate_sitemap(records)
+        with span('listings'):
+            generate_listings(records)
+    except Exception as e:
+        print(f"❌ error writing sitemap and listings: {e}")
+
 
 if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='generate rss.xml, the sitemap and the page listings')
+    add_profile_argument(parser)
+    profile(parser.parse_args().profile, 'generate_rss')
     generate_rss()
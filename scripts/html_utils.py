@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+small html helpers shared by the build scripts for loyal.love-website
+tags are edited in place with regexes so the prettier layout of the pages survives
+"""
+
+import os
+import re
+from typing import Callable, Optional
+
+
+SITE_URL: str = 'https://loyal.love'
+
+ATTR_TEMPLATE = r'(\s{name}\s*=\s*)(["\'])(.*?)\2'
+
+
+def find_tags(html: str, name: str):
+    """iterate over opening tags with the given name"""
+    pattern = re.compile(rf'<{name}\b[^>]*>', re.IGNORECASE | re.DOTALL)
+    return pattern.finditer(html)
+
+
+def replace_tags(html: str, name: str, replace: Callable) -> str:
+    """apply replace(match) to every opening tag with the given name"""
+    pieces = []
+    last = 0
+    for match in find_tags(html, name):
+        pieces.append(html[last:match.start()])
+        pieces.append(replace(match))
+        last = match.end()
+    pieces.append(html[last:])
+    return ''.join(pieces)
+
+
+def get_attr(tag: str, name: str) -> Optional[str]:
+    """return the value of an attribute in an opening tag, or None"""
+    match = re.search(ATTR_TEMPLATE.format(name=re.escape(name)), tag, re.IGNORECASE | re.DOTALL)
+    if match:
+        return match.group(3)
+    if re.search(rf'\s{re.escape(name)}(?=[\s/>])', tag, re.IGNORECASE):
+        return ''
+    return None
+
+
+def set_attr(tag: str, name: str, value: str) -> str:
+    """set (or replace) an attribute in an opening tag"""
+    pattern = re.compile(ATTR_TEMPLATE.format(name=re.escape(name)), re.IGNORECASE | re.DOTALL)
+    if pattern.search(tag):
+        return pattern.sub(lambda m: f'{m.group(1)}"{value}"', tag, count=1)
+    end = len(tag) - 2 if tag.endswith('/>') else len(tag) - 1
+    while end > 0 and tag[end - 1].isspace():
+        end -= 1
+    closing = ' />' if tag.endswith('/>') else '>'
+    return f'{tag[:end]} {name}="{value}"{closing}'
+
+
+def remove_attr(tag: str, name: str) -> str:
+    """remove an attribute from an opening tag"""
+    pattern = re.compile(r'\s+' + re.escape(name) + r'\s*=\s*(["\']).*?\1', re.IGNORECASE | re.DOTALL)
+    return pattern.sub('', tag, count=1)
+
+
+def resolve_local_path(reference: str, page_path: str) -> Optional[str]:
+    """resolve an href/src found in page_path to a repo-relative posix path
+
+    returns None for external urls, data uris, and pure anchors.
+    absolute links to the site itself (https://loyal.love/imgs/...) resolve locally.
+    """
+    if not reference:
+        return None
+    reference = reference.strip()
+    for prefix in (SITE_URL, SITE_URL.replace('https://', 'https://www.'), SITE_URL.replace('https://', 'http://')):
+        if reference.startswith(prefix):
+            reference = reference[len(prefix):] or '/'
+            break
+    if re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*:', reference) or reference.startswith(('//', '#')):
+        return None
+    reference = reference.split('#', 1)[0].split('?', 1)[0]
+    if not reference:
+        return None
+    if reference.startswith('/'):
+        resolved = os.path.normpath(reference.lstrip('/'))
+    else:
+        resolved = os.path.normpath(os.path.join(os.path.dirname(page_path), reference))
+    # the site root clamps '..' exactly like a browser does
+    parts = [part for part in resolved.replace(os.sep, '/').split('/') if part not in ('', '.', '..')]
+    return '/'.join(parts) or None
+
+
+def relative_reference(target: str, page_path: str) -> str:
+    """build a reference to a repo-relative target as seen from page_path"""
+    return os.path.relpath(target, os.path.dirname(page_path) or '.').replace(os.sep, '/')
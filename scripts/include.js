@@ -1,6 +1,7 @@
 async function includeHTML(elementId, contentPath, basePath = './') {
   const element = document.getElementById(elementId);
-  if (element) {
+  // pages from the build already carry the fragment inline
+  if (element && !element.hasAttribute('data-included')) {
     try {
       const response = await fetch(`${basePath}shared/${contentPath}`);
       const html = await response.text();
@@ -18,3 +19,27 @@ function includeTitle(elementId, basePath = './') {
 function includeFooter(elementId, basePath = './') {
   return includeHTML(elementId, 'footer.html', basePath);
 }
+
+// posts rotated out of index.html keep working at their old #anchors
+async function followArchivedAnchor(basePath = './') {
+  const postId = decodeURIComponent(location.hash.slice(1));
+  if (!postId || document.getElementById(postId)) return;
+  try {
+    const response = await fetch(`${basePath}chapters/anchors.json`);
+    const chapter = (await response.json())[postId];
+    if (chapter) location.replace(`${basePath}chapters/${chapter}#${postId}`);
+  } catch (error) {
+    console.error(`Error looking up archived post ${postId}:`, error);
+  }
+}
+
+// the search client only loads once someone types in the footer search box
+document.addEventListener('input', (event) => {
+  const input = event.target;
+  if (input.id !== 'post-search' || input.dataset.searchLoading) return;
+  input.dataset.searchLoading = 'true';
+  const script = document.createElement('script');
+  script.src = '/scripts/search.js';
+  script.onload = () => setupSearch(input);
+  document.head.appendChild(script);
+});
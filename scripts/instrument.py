@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+timing and profiling instrumentation shared by the scripts of loyal.love-website
+named spans (`with span('encode', file=path):`) are recorded only when profiling
+was turned on with --profile or $LOYAL_PROFILE, otherwise span() hands back one
+shared no-op object. on exit the spans are written as a chrome trace (open it in
+chrome://tracing or ui.perfetto.dev), with optional cprofile stats and
+tracemalloc top allocations next to it in .cache/profile/
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+
+########################################################
+#       constants
+########################################################
+
+ENV_VAR: str = 'LOYAL_PROFILE'
+PROFILE_DIR: str = '.cache/profile'
+MODES: List[str] = ['trace', 'cprofile', 'memory']
+MAX_EVENTS: int = 500000
+TOP_ENTRIES: int = 15
+
+
+########################################################
+#       spans
+########################################################
+
+class NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args) -> None:
+        pass
+
+
+class Span:
+    def __init__(self, name: str, args: Dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        if state['memory']:
+            import tracemalloc
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter_ns() - self.started
+        if state['memory']:
+            import tracemalloc
+            self.args['memory_kb'] = (tracemalloc.get_traced_memory()[0] - self.memory) // 1024
+        record({'name': self.name, 'ph': 'X', 'ts': self.started / 1000, 'dur': elapsed / 1000,
+                'pid': os.getpid(), 'tid': threading.get_ident(), 'args': self.args})
+        return False
+
+    def set(self, **args) -> None:
+        """attach what is only known once the work is done (a status, a byte count)"""
+        self.args.update(args)
+
+
+NOOP = NoopSpan()
+state: Dict = {'active': False, 'memory': False, 'name': None, 'profiler': None, 'dropped': 0}
+events: List[Dict] = []
+
+
+def span(name: str, **args):
+    """a timed section, `with span('parse', page=page):`"""
+    if not state['active']:
+        return NOOP
+    return Span(name, args)
+
+
+def record(event: Dict) -> None:
+    if len(events) < MAX_EVENTS:
+        events.append(event)
+    else:
+        state['dropped'] += 1
+
+
+def enabled() -> Optional[str]:
+    return ','.join(mode for mode in MODES if state.get(mode)) if state['active'] else None
+
+
+########################################################
+#       worker processes
+########################################################
+
+def start_worker(modes: Optional[str]) -> None:
+    """pool initializer: spans only, and none of the parent's already recorded ones"""
+    del events[:]
+    state['active'] = bool(modes)
+    state['memory'] = False
+    if state['profiler']:
+        state['profiler'].disable()
+        state['profiler'] = None
+
+
+def mark() -> int:
+    return len(events)
+
+
+def drain(since: int = 0) -> List[Dict]:
+    """take the events recorded after a mark(), to send them back from a worker"""
+    taken = events[since:]
+    del events[since:]
+    return taken
+
+
+def merge(recorded: List[Dict]) -> None:
+    for event in recorded:
+        record(event)
+
+
+########################################################
+#       setup and output
+########################################################
+
+def parse_modes(value: Optional[str]) -> List[str]:
+    value = (value or '').strip().lower()
+    if not value or value in ('0', 'off', 'false'):
+        return []
+    if value in ('1', 'on', 'true'):
+        return ['trace']
+    if value == 'all':
+        return list(MODES)
+    modes = [mode.strip() for mode in value.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        raise ValueError(f"unknown profile mode {', '.join(unknown)} (use {', '.join(MODES)} or all)")
+    return modes
+
+
+def add_profile_argument(parser) -> None:
+    parser.add_argument('--profile', nargs='?', const='trace', metavar='MODES',
+                        help=f"record spans and write a chrome trace; MODES is a comma separated list of "
+                             f"{', '.join(MODES)} or all (default: ${ENV_VAR})")
+
+
+def profile(modes: Optional[str], name: str) -> None:
+    """turn profiling on for this run from a --profile value, falling back to the environment"""
+    selected = parse_modes(modes if modes is not None else os.environ.get(ENV_VAR))
+    if not selected:
+        return
+    state.update(active=True, name=name, started=datetime.now(timezone.utc))
+    for mode in MODES:
+        state[mode] = mode in selected
+    if state['memory']:
+        import tracemalloc
+        tracemalloc.start()
+    if state['cprofile']:
+        import cProfile
+        state['profiler'] = cProfile.Profile()
+        state['profiler'].enable()
+    atexit.register(finish)
+
+
+def finish() -> None:
+    """write what was recorded, called at exit"""
+    if not state['active'] or state.get('finished'):
+        return
+    state['finished'] = True
+    if state['profiler']:
+        state['profiler'].disable()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{state['name']}-{state['started'].strftime('%Y%m%dT%H%M%SZ')}")
+
+    trace = {
+        'traceEvents': [{'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                         'args': {'name': state['name']}}] + events,
+        'displayTimeUnit': 'ms',
+        'otherData': {'command': ' '.join(sys.argv), 'dropped_events': state['dropped']},
+    }
+    with open(f"{base}.trace.json", 'w', encoding='utf-8') as f:
+        json.dump(trace, f)
+    print(f"\n👾 {len(events)} spans written to {base}.trace.json", file=sys.stderr)
+
+    totals: Dict[str, List[float]] = {}
+    for event in events:
+        totals.setdefault(event['name'], []).append(event['dur'] / 1000)
+    for name, durations in sorted(totals.items(), key=lambda item: -sum(item[1]))[:TOP_ENTRIES]:
+        print(f"  {name:<24} {len(durations):>6}×  total {sum(durations):9.1f}ms  max {max(durations):8.1f}ms",
+              file=sys.stderr)
+
+    if state['profiler']:
+        import pstats
+        state['profiler'].dump_stats(f"{base}.prof")
+        print(f"\n👾 cprofile stats written to {base}.prof", file=sys.stderr)
+        pstats.Stats(state['profiler'], stream=sys.stderr).sort_stats('cumulative').print_stats(TOP_ENTRIES)
+
+    if state['memory']:
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"\n👾 python memory: {current / 1048576:.1f}mb now, {peak / 1048576:.1f}mb peak", file=sys.stderr)
+        for stat in tracemalloc.take_snapshot().statistics('lineno')[:TOP_ENTRIES]:
+            print(f"  {stat}", file=sys.stderr)
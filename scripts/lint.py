@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+lint driver for loyal.love-website
+picks the html files that changed since the last clean lint (content hashes
+in .cache/, or `git diff` against a ref with --since) and hands them to a few
+long-lived scripts/lint_worker.js processes, which fix links, format with
+prettier and validate with html-validate one file at a time, in parallel.
+whitespace the formatter changed in posts is written back to their posts/
+records, so rendering the pages afterwards keeps it
+"""
+
+import os
+import sys
+import json
+import queue
+import hashlib
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+from post_store import adopt_formatting, find_pages
+
+
+########################################################
+#       constants
+########################################################
+
+SCRIPTS_DIR: str = os.path.dirname(os.path.abspath(__file__))
+LINT_GLOBS: List[str] = ['index.html', 'chapters/*.html', 'shared/*.html']
+CONFIG_FILES: List[str] = ['.github/workflows/.prettierrc.json', '.github/workflows/.htmlvalidate.json',
+                           'scripts/lint_worker.js', 'scripts/fix_links.js']
+STATE_FILE: str = '.cache/lint-state.json'
+STATE_VERSION: int = 1
+
+
+########################################################
+#       changed files
+########################################################
+
+def lint_files() -> List[str]:
+    return sorted({p.as_posix() for pattern in LINT_GLOBS for p in Path('.').glob(pattern)})
+
+
+def file_hash(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def config_hash() -> str:
+    """a change to the lint config or the worker relints everything"""
+    digest = hashlib.sha256()
+    for path in CONFIG_FILES:
+        if os.path.exists(path):
+            digest.update(file_hash(path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def load_state(state_path: str) -> Dict:
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') == STATE_VERSION and state.get('config') == config_hash():
+            return state
+    except (OSError, ValueError):
+        pass
+    return {'version': STATE_VERSION, 'config': config_hash(), 'files': {}}
+
+
+def save_state(state: Dict, state_path: str) -> None:
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+
+def changed_since(ref: str) -> List[str]:
+    """lintable files that differ from ref, including uncommitted and untracked ones"""
+    commands = [['git', 'diff', '--name-only', ref, '--'] + LINT_GLOBS,
+                ['git', 'ls-files', '--others', '--exclude-standard', '--'] + LINT_GLOBS]
+    names = set()
+    for command in commands:
+        names.update(subprocess.run(command, capture_output=True, text=True, check=True).stdout.split())
+    candidates = set(lint_files())
+    return sorted(name for name in names if name in candidates)
+
+
+def changed_files(state: Dict) -> List[str]:
+    return [path for path in lint_files() if state['files'].get(path) != file_hash(path)]
+
+
+########################################################
+#       workers
+########################################################
+
+def run_workers(files: List[str], jobs: int, check: bool) -> List[Dict]:
+    """lint files over min(jobs, files) node workers, each taking the next file when it is free"""
+    pending: queue.Queue = queue.Queue()
+    for path in files:
+        pending.put(path)
+    results: List[Dict] = []
+    lock = threading.Lock()
+    command = ['node', os.path.join(SCRIPTS_DIR, 'lint_worker.js')] + (['--check'] if check else [])
+
+    def worker(process):
+        broken = False
+        try:
+            while not broken:
+                try:
+                    path = pending.get_nowait()
+                except queue.Empty:
+                    break
+                line = ''
+                try:
+                    process.stdin.write(path + '\n')
+                    process.stdin.flush()
+                    line = process.stdout.readline()
+                    result = json.loads(line)
+                    if not isinstance(result, dict) or result.get('path') != path:
+                        raise ValueError(f"answer for another file: {line}")
+                except (OSError, ValueError):
+                    # a crashed worker, or one that printed something else: it is out of step, stop using it
+                    broken = True
+                    result = {'path': path, 'changed': False, 'errors': [],
+                              'failure': f"lint worker answered {line.strip()[:200]!r}" if line.strip()
+                              else 'lint worker exited'}
+                with lock:
+                    results.append(result)
+                    report(result, check)
+        finally:
+            if broken:
+                process.kill()
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+            process.wait()
+
+    processes = [subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+                 for _ in range(max(1, min(jobs, len(files))))]
+    threads = [threading.Thread(target=worker, args=(process,)) for process in processes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # files left over when every worker broke down count as failed too
+    while not pending.empty():
+        result = {'path': pending.get_nowait(), 'changed': False, 'errors': [],
+                  'failure': 'not linted, no lint worker left'}
+        results.append(result)
+        report(result, check)
+    return results
+
+
+def passed(result: Dict, check: bool) -> bool:
+    return not result['errors'] and not result.get('failure') and not (check and result['changed'])
+
+
+def report(result: Dict, check: bool) -> None:
+    if result.get('failure'):
+        print(f"❌ {result['path']}: {result['failure']}")
+    elif check and result['changed']:
+        print(f"❌ {result['path']}: not formatted")
+    elif not result['errors']:
+        print(f"✓ {result['path']}{' (formatted)' if result['changed'] else ''}")
+    for error in result['errors']:
+        print(f"❌ {result['path']}:{error['line']}:{error['column']} {error['message']} ({error['rule']})")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='fix links, format and validate the html files that changed')
+    parser.add_argument('files', nargs='*', help='lint these files instead of the changed ones')
+    parser.add_argument('--all', action='store_true', help='lint every page, changed or not')
+    parser.add_argument('--since', metavar='REF', help='lint what changed since a git ref instead of the hash cache')
+    parser.add_argument('--check', action='store_true', help='only report, do not rewrite files (for ci)')
+    parser.add_argument('--jobs', type=int, default=min(4, os.cpu_count() or 1), help='parallel lint workers')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(SCRIPTS_DIR))
+    state = load_state(STATE_FILE)
+    try:
+        if args.files:
+            files = args.files
+        elif args.all:
+            files = lint_files()
+        elif args.since:
+            files = changed_since(args.since)
+        else:
+            files = changed_files(state)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"❌ could not list changed files: {e}")
+        return 1
+    if not files:
+        print("✅ nothing changed since the last lint")
+        return 0
+
+    print(f"👾 linting {len(files)} of {len(lint_files())} files with {max(1, min(args.jobs, len(files)))} workers")
+    try:
+        results = run_workers(files, args.jobs, args.check)
+    except OSError as e:
+        print(f"❌ could not start the lint workers (is node installed? run npm install): {e}")
+        return 1
+
+    failed = [result for result in results if not passed(result, args.check)]
+    # pages are rendered from posts/, so the formatting has to land in the records or the next build undoes it
+    post_pages = set(find_pages())
+    for result in results:
+        if result['changed'] and not args.check and result['path'] in post_pages:
+            for post_id in adopt_formatting(result['path']):
+                print(f"✓ posts/{post_id}.html: formatted like {result['path']}")
+    for result in results:
+        if passed(result, args.check) and os.path.exists(result['path']):
+            state['files'][result['path']] = file_hash(result['path'])
+        else:
+            state['files'].pop(result['path'], None)
+    save_state(state, STATE_FILE)
+
+    if failed:
+        print(f"\n❌ {len(failed)} of {len(results)} files failed lint")
+        return 1
+    print(f"\n✅ linted {len(results)} files")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
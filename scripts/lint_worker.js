@@ -0,0 +1,54 @@
+#!/usr/bin/env node
+
+// long-lived lint worker started by scripts/lint.py
+// reads one file path per line on stdin, fixes its links, formats it with prettier and
+// validates it with html-validate, then answers with one json line on stdout.
+// prettier and html-validate are loaded once per worker instead of once per tool run
+
+import fs from 'fs';
+import path from 'path';
+import readline from 'readline';
+import * as prettier from 'prettier';
+import { HtmlValidate } from 'html-validate';
+import { fixLinks } from './fix_links.js';
+
+const CONFIG_DIR = '.github/workflows';
+const check = process.argv.includes('--check');
+const prettierOptions = JSON.parse(fs.readFileSync(path.join(CONFIG_DIR, '.prettierrc.json'), 'utf8'));
+const htmlvalidate = new HtmlValidate(JSON.parse(fs.readFileSync(path.join(CONFIG_DIR, '.htmlvalidate.json'), 'utf8')));
+
+async function lintFile(file) {
+    const original = fs.readFileSync(file, 'utf8');
+    const absolute = path.resolve(file);
+    let content = fixLinks(original, absolute, path.dirname(absolute));
+    content = await prettier.format(content, { ...prettierOptions, filepath: file });
+
+    const changed = content !== original;
+    if (changed && !check) {
+        fs.writeFileSync(file, content);
+    }
+
+    const report = await htmlvalidate.validateString(content, file);
+    const errors = report.results.flatMap(result =>
+        result.messages.map(message => ({
+            line: message.line,
+            column: message.column,
+            rule: message.ruleId,
+            message: message.message,
+        }))
+    );
+    return { path: file, changed, errors };
+}
+
+const lines = readline.createInterface({ input: process.stdin });
+for await (const line of lines) {
+    const file = line.trim();
+    if (!file) continue;
+    let result;
+    try {
+        result = await lintFile(file);
+    } catch (error) {
+        result = { path: file, changed: false, errors: [], failure: String(error.message || error) };
+    }
+    process.stdout.write(JSON.stringify(result) + '\n');
+}
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+html minification for loyal.love-website pages
+strips comments and collapses whitespace between tags and attributes, leaving
+attribute values and <pre>/<textarea>/<script>/<style> untouched. repeated
+style="..." attributes stay inline on purpose: moved into generated classes
+they needed !important to keep winning, which then beat the stylesheet's own
+!important rules and the el.style writes the lazy loader relies on, while
+gzip already squeezes the repeats to almost nothing
+"""
+
+import re
+import sys
+import argparse
+from typing import List
+
+
+########################################################
+#       constants
+########################################################
+
+PROTECTED_PATTERN = re.compile(r'<(pre|textarea|script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+COMMENT_PATTERN = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+TAG_PATTERN = re.compile(r'<[a-zA-Z/!][^<>]*>')
+QUOTED_OR_SPACE_PATTERN = re.compile(r'("[^"]*"|\'[^\']*\')|\s+')
+PLACEHOLDER = '\x00{}\x00'
+
+
+########################################################
+#       minify
+########################################################
+
+def collapse_whitespace(html: str) -> str:
+    """one space for every run of whitespace in text and between attributes, never inside a quoted value"""
+    pieces = []
+    last = 0
+    for match in TAG_PATTERN.finditer(html):
+        pieces.append(re.sub(r'\s+', ' ', html[last:match.start()]))
+        pieces.append(QUOTED_OR_SPACE_PATTERN.sub(lambda m: m.group(1) or ' ', match.group(0)))
+        last = match.end()
+    pieces.append(re.sub(r'\s+', ' ', html[last:]))
+    return ''.join(pieces)
+
+
+def minify(html: str) -> str:
+    protected: List[str] = []
+
+    def protect(match):
+        protected.append(match.group(0))
+        return PLACEHOLDER.format(len(protected) - 1)
+
+    html = PROTECTED_PATTERN.sub(protect, html)
+    html = COMMENT_PATTERN.sub('', html)
+    html = collapse_whitespace(html)
+    # whitespace next to document-level tags never renders
+    html = re.sub(r'\s*(<(?:!doctype|/?html|/?head|/?body|meta|link|/?title)\b[^>]*>)\s*', r'\1', html, flags=re.IGNORECASE)
+    html = TAG_PATTERN.sub(lambda m: re.sub(r'\s*(/?>)$', r'\1', m.group(0)), html)
+    return re.sub('\x00(\\d+)\x00', lambda m: protected[int(m.group(1))], html).strip() + '\n'
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='minify an html file')
+    parser.add_argument('input', help='html file to minify')
+    parser.add_argument('--output', help='write here instead of stdout')
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        original = f.read()
+    minified = minify(original)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(minified)
+        print(f"✅ {args.input}: {len(original.encode())} → {len(minified.encode())} bytes")
+    else:
+        sys.stdout.write(minified)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
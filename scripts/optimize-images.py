@@ -1,31 +1,69 @@
 #!/usr/bin/env python3
 """
 image optimization script for loyal.love-website
-compresses images and creates webp versions for better performance
+compresses images and creates webp versions for better performance,
+plus blurred placeholders and video poster frames for the page build
 """
 
 import os
 import sys
+import io
+import json
+import base64
+import shutil
 from pathlib import Path
-from PIL import Image
+from PIL import Image, ImageFilter
 import subprocess
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 
+from instrument import add_profile_argument, drain, enabled, mark, merge, profile, span, start_worker
 
-def optimize_image(input_path, output_path, quality=85, max_width=None, max_height=None):
-    """optimize a single image"""
+
+PLACEHOLDER_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
+VIDEO_EXTENSIONS = {'.mp4', '.mov', '.webm'}
+VARIANT_SUFFIXES = ('_optimized', '_webp', '_poster')
+
+
+def decoded_size(img):
+    """bytes needed to hold the decoded bitmap at the current (possibly drafted) size"""
+    bands = 4 if img.mode == 'P' else len(img.getbands())
+    return img.width * img.height * bands
+
+
+def optimize_image(input_path, output_path, quality=85, max_width=None, max_height=None, max_memory_mb=None):
+    """optimize a single image
+
+    jpegs are decoded straight at a reduced scale with draft(), palette images
+    are shrunk before they are expanded to rgb(a), everything is downscaled
+    before the alpha composite, and images whose decoded bitmap would not fit
+    in max_memory_mb are skipped before any pixel is decoded.
+    """
     try:
         with Image.open(input_path) as img:
-            if img.mode in ('RGBA', 'LA', 'P'):
+            target = (max_width or img.width, max_height or img.height)
+            if img.format == 'JPEG':
+                img.draft('RGB', target)
+            # decode + resize buffers roughly double the bitmap at peak
+            needed = decoded_size(img) * 2
+            if max_memory_mb and needed > max_memory_mb * 1024 * 1024:
+                raise MemoryError(f"needs ~{needed / (1024 * 1024):.0f}mb to decode, ceiling is {max_memory_mb}mb")
+            if img.mode == 'P':
+                # palette images only resize with nearest, so a nearest pass down to twice
+                # the target keeps the converted copy small and lanczos does the rest
+                factor = int(max(img.width / target[0], img.height / target[1]) / 2)
+                if factor > 1:
+                    img = img.resize((img.width // factor, img.height // factor), Image.Resampling.NEAREST)
+                img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+            elif img.mode not in ('RGB', 'RGBA', 'LA', 'L'):
+                img = img.convert('RGB')
+            img.thumbnail(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            if img.mode in ('RGBA', 'LA'):
                 background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+                background.paste(img, mask=img.getchannel('A'))
                 img = background
             elif img.mode != 'RGB':
                 img = img.convert('RGB')
-            if max_width or max_height:
-                img.thumbnail((max_width or img.width, max_height or img.height), Image.Resampling.LANCZOS)
             img.save(output_path, 'JPEG', quality=quality, optimize=True)
             return True
     except Exception as e:
@@ -33,6 +71,87 @@ def optimize_image(input_path, output_path, quality=85, max_width=None, max_heig
         return False
 
 
+# the address space limit a worker had before limit_worker_memory, restored for cwebp
+inherited_memory_limit = None
+
+
+def limit_worker_memory(max_memory_mb):
+    """cap the address space of a worker process at its current size plus the ceiling
+
+    only pool workers are capped, with one worker the images are optimized in
+    the caller's process (the build, the dev server), which keeps its limits;
+    the decoded size check in optimize_image still applies there
+    """
+    global inherited_memory_limit
+    if not max_memory_mb:
+        return
+    try:
+        import resource
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[0]) * resource.getpagesize()
+        limit = current + max_memory_mb * 1024 * 1024
+        previous = resource.getrlimit(resource.RLIMIT_AS)
+        # only the soft limit, so cwebp can be given the old one back
+        resource.setrlimit(resource.RLIMIT_AS, (limit, previous[1]))
+        inherited_memory_limit = previous
+    except (ImportError, OSError, ValueError):
+        pass
+
+
+def restore_memory_limit():
+    """runs in the cwebp child before exec, it sizes its own buffers and is not a python decode"""
+    import resource
+    resource.setrlimit(resource.RLIMIT_AS, inherited_memory_limit)
+
+
+def init_worker(max_memory_mb, profiling):
+    limit_worker_memory(max_memory_mb)
+    start_worker(profiling)
+
+
+def optimize_one(file_path, quality, webp_quality, max_width, max_height, max_memory_mb):
+    """optimize one image and its webp variant, returns sizes (and, when profiling, spans) for the summary"""
+    since = mark()
+    with span('image', file=os.path.basename(file_path)):
+        result = optimize_variants(file_path, quality, webp_quality, max_width, max_height, max_memory_mb)
+    spans = drain(since)
+    if spans:
+        result['spans'] = spans
+    return result
+
+
+def variant_paths(file_path):
+    """where the optimized jpeg and the webp of a source image are written"""
+    return (file_path.parent / f"{file_path.stem}_optimized{file_path.suffix}",
+            file_path.parent / f"{file_path.stem}_webp.webp")
+
+
+def variants_are_fresh(file_path):
+    """true when the variants exist and are newer than the source (the webp only counts when cwebp is installed)"""
+    source_mtime = file_path.stat().st_mtime
+    optimized_path, webp_path = variant_paths(file_path)
+    variants = [optimized_path, webp_path] if shutil.which('cwebp') else [optimized_path]
+    return all(path.exists() and path.stat().st_mtime >= source_mtime for path in variants)
+
+
+def optimize_variants(file_path, quality, webp_quality, max_width, max_height, max_memory_mb):
+    file_path = Path(file_path)
+    result = {'path': site_path(file_path), 'original_size': get_file_size_mb(file_path)}
+    optimized_path, webp_path = variant_paths(file_path)
+    with span('encode jpeg'):
+        optimized = optimize_image(str(file_path), str(optimized_path), quality, max_width, max_height, max_memory_mb)
+    if not optimized:
+        return result
+    result['optimized'] = site_path(optimized_path)
+    result['optimized_size'] = get_file_size_mb(optimized_path)
+    with span('encode webp'):
+        webp = create_webp(str(optimized_path), str(webp_path), webp_quality)
+    if webp:
+        result['webp'] = site_path(webp_path)
+        result['webp_size'] = get_file_size_mb(webp_path)
+    return result
+
+
 def create_webp(input_path, output_path, quality=80):
     """create webp version of image"""
     try:
@@ -47,11 +166,125 @@ def create_webp(input_path, output_path, quality=80):
             input_path,
             '-o', output_path
         ]
-        subprocess.run(cmd, check=True, capture_output=True)
+        subprocess.run(cmd, check=True, capture_output=True,
+                       preexec_fn=restore_memory_limit if inherited_memory_limit else None)
         return True
     except subprocess.CalledProcessError as e:
         print(f"error creating webp for {input_path}: {e}")
         return False
+    except FileNotFoundError:
+        print(f"cwebp not found, skipping webp for {input_path}")
+        return False
+
+
+def create_placeholder(input_path, size=24, blur_radius=1.5):
+    """create a tiny blurred placeholder and return it as a data uri"""
+    try:
+        with Image.open(input_path) as img:
+            img.seek(0)
+            width, height = img.size
+            img.draft('RGB', (size * 4, size * 4))
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.thumbnail((size, size), Image.Resampling.BILINEAR)
+            if img.mode == 'RGBA':
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.split()[-1])
+                img = background
+            img = img.filter(ImageFilter.GaussianBlur(blur_radius))
+            buffer = io.BytesIO()
+            img.save(buffer, 'WEBP', quality=30, method=6)
+            encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+            return {
+                'width': width,
+                'height': height,
+                'placeholder': f"data:image/webp;base64,{encoded}",
+            }
+    except Exception as e:
+        print(f"error creating placeholder for {input_path}: {e}")
+        return None
+
+
+def read_video_frame(video_path, at_seconds=1.0):
+    """decode one frame as a PIL image with whichever decoder is installed (PyAV or OpenCV)"""
+    try:
+        import av
+    except ImportError:
+        av = None
+    if av is not None:
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            try:
+                container.seek(int(at_seconds / stream.time_base), stream=stream)
+            except Exception:
+                container.seek(0)
+            for frame in container.decode(stream):
+                return frame.to_image()
+        return None
+
+    try:
+        import cv2
+    except ImportError:
+        return None
+    capture = cv2.VideoCapture(video_path)
+    try:
+        capture.set(cv2.CAP_PROP_POS_MSEC, at_seconds * 1000)
+        ok, frame = capture.read()
+        if not ok:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = capture.read()
+        if not ok:
+            return None
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    finally:
+        capture.release()
+
+
+def create_poster(video_path, output_path, quality=85, max_width=1920, max_height=1080):
+    """extract a poster frame for a video, returns its size or None when no decoder is available"""
+    try:
+        frame = read_video_frame(video_path)
+    except Exception as e:
+        print(f"error decoding {video_path}: {e}")
+        return None
+    if frame is None:
+        return None
+    frame = frame.convert('RGB')
+    frame.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+    frame.save(output_path, 'JPEG', quality=quality, optimize=True)
+    return {'width': frame.width, 'height': frame.height}
+
+
+def load_manifest(manifest_path):
+    """load the image manifest, or an empty one if it does not exist yet"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, manifest_path):
+    """write the image manifest with stable key order"""
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def site_path(file_path):
+    """repo-relative posix path, how build_pages looks manifest entries up, whatever --directory was"""
+    path = Path(file_path).resolve()
+    try:
+        return path.relative_to(Path.cwd().resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def is_variant(file_path):
+    """true for files generated by this script (optimized, webp, poster)"""
+    return file_path.stem.endswith(VARIANT_SUFFIXES)
 
 
 def get_file_size_mb(file_path):
@@ -59,33 +292,102 @@ def get_file_size_mb(file_path):
     return os.path.getsize(file_path) / (1024 * 1024)
 
 
-def optimize_images_in_directory(directory, quality=85, webp_quality=80, max_width=1920, max_height=1080):
-    """optimize all images in a directory"""
+def optimize_images_in_directory(directory, quality=85, webp_quality=80, max_width=1920, max_height=1080,
+                                 manifest_path=None, placeholder_size=24, workers=1, max_memory_mb=None,
+                                 only=None, force=False):
+    """optimize all images in a directory
+
+    only limits re-encoding to those source paths (placeholders and posters are
+    still refreshed everywhere), and a source whose variants are newer than it
+    is skipped unless force is set.
+    """
     image_extensions = {'.jpg', '.jpeg', '.png'}
     optimized_count = 0
     total_saved = 0
+    manifest_path = manifest_path or os.path.join(directory, 'manifest.json')
+    manifest = {}
+    # older manifests were keyed however --directory was written
+    for key, entry in load_manifest(manifest_path).items():
+        for field in ('optimized', 'webp', 'poster'):
+            if entry.get(field):
+                entry[field] = site_path(entry[field])
+        manifest[site_path(key)] = entry
+    only = None if only is None else {Path(path).resolve() for path in only}
+    to_optimize = []
+    up_to_date = 0
     
     print(f"optimizing images in {directory}...")
-    for file_path in Path(directory).rglob('*'):
-        if file_path.suffix.lower() in image_extensions:
-            if file_path.stem.endswith('_optimized') or file_path.stem.endswith('_webp'):
+    for file_path in sorted(Path(directory).rglob('*')):
+        if file_path.suffix.lower() in PLACEHOLDER_EXTENSIONS and not is_variant(file_path):
+            key = site_path(file_path)
+            stat = file_path.stat()
+            entry = manifest.get(key, {})
+            if entry.get('mtime') != stat.st_mtime or entry.get('placeholder_size') != placeholder_size:
+                with span('placeholder', file=file_path.name):
+                    placeholder = create_placeholder(str(file_path), placeholder_size)
+                if placeholder:
+                    entry.update(placeholder)
+                    entry['mtime'] = stat.st_mtime
+                    entry['placeholder_size'] = placeholder_size
+            entry['bytes'] = stat.st_size
+            manifest[key] = entry
+        if file_path.suffix.lower() in VIDEO_EXTENSIONS:
+            key = site_path(file_path)
+            stat = file_path.stat()
+            entry = manifest.get(key, {})
+            poster_path = file_path.parent / f"{file_path.stem}_poster.jpg"
+            if entry.get('mtime') != stat.st_mtime or not poster_path.exists():
+                with span('poster', file=file_path.name):
+                    poster = create_poster(str(file_path), str(poster_path), quality, max_width, max_height)
+                if poster:
+                    entry.update(poster)
+                    entry['poster'] = site_path(poster_path)
+                    entry['mtime'] = stat.st_mtime
+                    print(f"✓ {file_path.name}: poster frame → {poster_path.name}")
+                    placeholder = create_placeholder(str(poster_path), placeholder_size)
+                    if placeholder:
+                        entry['placeholder'] = placeholder['placeholder']
+                else:
+                    entry.pop('poster', None)
+                    print(f"  skipping poster for {file_path.name} (no video decoder, pip install av or opencv-python)")
+            entry['bytes'] = stat.st_size
+            manifest[key] = entry
+        if file_path.suffix.lower() in image_extensions and not is_variant(file_path):
+            if only is not None and file_path.resolve() not in only:
                 continue
-            original_size = get_file_size_mb(file_path)
-            optimized_path = file_path.parent / f"{file_path.stem}_optimized{file_path.suffix}"
-            if optimize_image(str(file_path), str(optimized_path), quality, max_width, max_height):
-                optimized_size = get_file_size_mb(optimized_path)
-                saved = original_size - optimized_size
-                total_saved += saved
-                print(f"✓ {file_path.name}: {original_size:.1f}mb → {optimized_size:.1f}mb (saved {saved:.1f}mb)")
-                webp_path = file_path.parent / f"{file_path.stem}_webp.webp"
-                if create_webp(str(optimized_path), str(webp_path), webp_quality):
-                    webp_size = get_file_size_mb(webp_path)
-                    print(f"  webp: {webp_size:.1f}mb")
-                
-                optimized_count += 1
+            if not force and variants_are_fresh(file_path):
+                up_to_date += 1
+                continue
+            to_optimize.append(str(file_path))
+
+    options = (quality, webp_quality, max_width, max_height, max_memory_mb)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(max_memory_mb, enabled())) as pool:
+            futures = [pool.submit(optimize_one, path, *options) for path in to_optimize]
+            results = [future.result() for future in futures]
+    else:
+        results = [optimize_one(path, *options) for path in to_optimize]
+
+    for result in results:
+        merge(result.pop('spans', []))
+        if 'optimized' not in result:
+            continue
+        name = os.path.basename(result['path'])
+        saved = result['original_size'] - result['optimized_size']
+        total_saved += saved
+        print(f"✓ {name}: {result['original_size']:.1f}mb → {result['optimized_size']:.1f}mb (saved {saved:.1f}mb)")
+        manifest[result['path']]['optimized'] = result['optimized']
+        if 'webp' in result:
+            print(f"  webp: {result['webp_size']:.1f}mb")
+            manifest[result['path']]['webp'] = result['webp']
+        optimized_count += 1
+    manifest = {key: entry for key, entry in manifest.items() if os.path.exists(key)}
+    save_manifest(manifest, manifest_path)
     print(f"\noptimization complete!")
-    print(f"optimized {optimized_count} images")
+    print(f"optimized {optimized_count} images ({up_to_date} already up to date)")
     print(f"total space saved: {total_saved:.1f}mb")
+    print(f"placeholders written to {manifest_path}")
     return optimized_count, total_saved
 
 
@@ -96,8 +398,16 @@ def main():
     parser.add_argument('--webp-quality', type=int, default=80, help='webp quality (1-100)')
     parser.add_argument('--max-width', type=int, default=1920, help='maximum width for images')
     parser.add_argument('--max-height', type=int, default=1080, help='maximum height for images')
+    parser.add_argument('--manifest', default=None, help='manifest path (default: <directory>/manifest.json)')
+    parser.add_argument('--placeholder-size', type=int, default=24, help='longest side of blurred placeholders in px')
+    parser.add_argument('--workers', type=int, default=1, help='parallel worker processes')
+    parser.add_argument('--max-memory-mb', type=int, default=None,
+                        help='decode memory ceiling per image in mb, also caps each worker process with --workers > 1')
+    parser.add_argument('--force', action='store_true', help='re-encode images whose variants are newer than them')
+    add_profile_argument(parser)
     
     args = parser.parse_args()
+    profile(args.profile, 'optimize-images')
     
     if not os.path.exists(args.directory):
         print(f"directory {args.directory} does not exist")
@@ -107,7 +417,12 @@ def main():
         args.quality, 
         args.webp_quality, 
         args.max_width, 
-        args.max_height
+        args.max_height,
+        args.manifest,
+        args.placeholder_size,
+        args.workers,
+        args.max_memory_mb,
+        force=args.force
     )
 
 
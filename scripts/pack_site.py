@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+single-file site archive for loyal.love-website
+packs the built site into one file: every response body (identity and gzip,
+identical files stored once) followed by a json index of url -> body offsets
+plus the headers the server would otherwise work out per request (type,
+etag, last-modified, preload links). scripts/server.py --pack serves it from
+one mmap, slicing bodies out of it without opening a file per request.
+the pack is written next to its target and renamed over it, so a deploy is
+one atomic swap (send the server SIGHUP to pick up the new one)
+"""
+
+import os
+import sys
+import gzip
+import json
+import mmap
+import struct
+import hashlib
+import argparse
+import mimetypes
+from datetime import datetime, timezone
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from server import critical_resources, link_header
+
+
+########################################################
+#       constants
+########################################################
+
+MAGIC: bytes = b'LOVEPACK'
+VERSION: int = 1
+# magic, version, index offset, index length
+HEADER = struct.Struct('<8sIQQ')
+DEFAULT_OUTPUT: str = 'site.pack'
+COMPRESSIBLE_TYPES = {'text/html', 'text/css', 'application/javascript', 'text/plain', 'application/json',
+                      'text/xml', 'application/xml', 'image/svg+xml'}
+SKIPPED_NAMES = {'.DS_Store'}
+
+mimetypes.add_type('text/css', '.css')
+mimetypes.add_type('application/javascript', '.js')
+mimetypes.add_type('image/webp', '.webp')
+
+
+########################################################
+#       packing
+########################################################
+
+def content_type(path: Path) -> str:
+    if path.name.endswith('.xml.gz'):
+        return 'application/gzip'
+    return mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+
+
+def gzip_body(path: Path, data: bytes) -> Optional[bytes]:
+    """the precompressed .gz next to the file when it is fresh, otherwise gzip it now"""
+    gz_path = path.with_name(path.name + '.gz')
+    if gz_path.exists() and gz_path.stat().st_mtime >= path.stat().st_mtime:
+        compressed = gz_path.read_bytes()
+    else:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    return compressed if len(compressed) < len(data) else None
+
+
+def pack_site(root: str, output: str = DEFAULT_OUTPUT) -> Dict:
+    """write every file under root into one archive at output, returns counts"""
+    root_path = Path(root)
+    entries: Dict[str, Dict] = {}
+    blobs: Dict[str, Tuple[int, int]] = {}
+    temporary = f"{output}.tmp"
+    stored = 0
+
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+
+        def store(data: bytes) -> Tuple[int, int]:
+            nonlocal stored
+            digest = hashlib.sha256(data).hexdigest()
+            if digest not in blobs:
+                blobs[digest] = (f.tell(), len(data))
+                f.write(data)
+                stored += len(data)
+            return blobs[digest]
+
+        for path in sorted(p for p in root_path.rglob('*') if p.is_file()):
+            # .gz siblings are served as the gzip body of their file, not as urls of their own
+            if path.name in SKIPPED_NAMES or (path.suffix == '.gz' and path.with_suffix('').exists()):
+                continue
+            relative = path.relative_to(root_path).as_posix()
+            kind = content_type(path)
+            data = path.read_bytes()
+            stat = path.stat()
+            headers = {
+                'Content-Type': kind,
+                'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+                'ETag': f'"{hashlib.sha256(data).hexdigest()[:16]}"',
+            }
+            if kind == 'text/html':
+                links = link_header(critical_resources(data.decode('utf-8', errors='ignore'), relative))
+                if links:
+                    headers['Link'] = links
+            entry = {'headers': headers, 'identity': store(data), 'gzip': None}
+            if kind in COMPRESSIBLE_TYPES:
+                compressed = gzip_body(path, data)
+                if compressed:
+                    entry['gzip'] = store(compressed)
+            entries['/' + relative] = entry
+
+        index = json.dumps({
+            'version': VERSION,
+            'created': datetime.now(timezone.utc).isoformat(),
+            'root': root,
+            'entries': entries,
+        }, separators=(',', ':')).encode('utf-8')
+        index_offset = f.tell()
+        f.write(index)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, index_offset, len(index)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, output)
+    return {'entries': len(entries), 'bodies': len(blobs), 'bytes': stored + len(index) + HEADER.size}
+
+
+########################################################
+#       reading
+########################################################
+
+class SitePack:
+    """a mapped pack: lookup() gives headers and zero-copy memoryview bodies"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_offset, index_length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} site pack")
+        index = json.loads(self.map[index_offset:index_offset + index_length])
+        self.entries: Dict[str, Dict] = index['entries']
+        self.created: str = index['created']
+        self.view = memoryview(self.map)
+
+    def lookup(self, url_path: str) -> Optional[Dict]:
+        if url_path.endswith('/'):
+            url_path += 'index.html'
+        return self.entries.get(url_path)
+
+    def is_directory(self, url_path: str) -> bool:
+        return f"{url_path.rstrip('/')}/index.html" in self.entries
+
+    def body(self, span: Tuple[int, int]) -> memoryview:
+        offset, length = span
+        return self.view[offset:offset + length]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='pack the built site into one archive for scripts/server.py --pack')
+    parser.add_argument('--root', default='build', help='built site to pack, relative to the repo (default: build)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f'archive to write (default: {DEFAULT_OUTPUT})')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if not os.path.isdir(args.root):
+        print(f"❌ {args.root}/ does not exist, run make build first")
+        return 1
+    try:
+        stats = pack_site(args.root, args.output)
+    except OSError as e:
+        print(f"❌ error packing {args.root}: {e}")
+        return 1
+    print(f"✅ packed {stats['entries']} urls ({stats['bodies']} bodies, {stats['bytes'] / 1048576:.1f}mb) "
+          f"into {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
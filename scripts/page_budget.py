@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+per-page transfer budget report for loyal.love-website
+sums what each page pulls on first load (raw, gzip, gzip + webp variants)
+and fails when a page goes over its configured budget
+"""
+
+import os
+import sys
+import gzip
+import json
+import argparse
+from typing import Dict, List
+
+from asset_graph import build_graph, page_loads, variants_of
+
+
+########################################################
+#       constants
+########################################################
+
+BUDGET_CONFIG: str = '.github/workflows/.page-budgets.json'
+COMPRESSIBLE_EXTENSIONS = {'.html', '.css', '.js', '.xml', '.txt', '.json', '.svg'}
+METRICS = ('raw', 'gzip', 'webp')
+
+
+########################################################
+#       sizes
+########################################################
+
+def gzip_size(path: str, cache: Dict[str, int]) -> int:
+    """compressed size of a text asset, using the precompressed file if it is fresh"""
+    if path not in cache:
+        gz_path = path + '.gz'
+        if os.path.exists(gz_path) and os.path.getmtime(gz_path) >= os.path.getmtime(path):
+            cache[path] = os.path.getsize(gz_path)
+        else:
+            with open(path, 'rb') as f:
+                cache[path] = len(gzip.compress(f.read(), compresslevel=9))
+    return cache[path]
+
+
+def page_sizes(graph: Dict, page: str, gzip_cache: Dict[str, int]) -> Dict:
+    """raw, gzip and gzip + webp transfer bytes for one page"""
+    paths = [page] + sorted(path for path in page_loads(graph, page) if path in graph['assets'])
+    sizes = {'page': page, 'requests': len(paths), 'raw': 0, 'gzip': 0, 'webp': 0}
+    for path in paths:
+        raw = graph['assets'][path]
+        compressed = gzip_size(path, gzip_cache) if os.path.splitext(path)[1] in COMPRESSIBLE_EXTENSIONS else raw
+        webp = compressed
+        webp_variant = variants_of(path)[1]
+        if path.lower().endswith(('.jpg', '.jpeg', '.png')) and webp_variant in graph['assets']:
+            webp = min(compressed, graph['assets'][webp_variant])
+        sizes['raw'] += raw
+        sizes['gzip'] += compressed
+        sizes['webp'] += webp
+    return sizes
+
+
+def load_budgets(config_path: str) -> Dict:
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"❌ could not read budgets from {config_path}: {e}")
+        return {}
+
+
+def budget_for(budgets: Dict, page: str) -> Dict:
+    """page-specific budget merged over the default one"""
+    budget = dict(budgets.get('default', {}))
+    budget.update(budgets.get('pages', {}).get(page, {}))
+    return budget
+
+
+def check_budgets(report: List[Dict], budgets: Dict) -> List[str]:
+    """return one message per page that is over any of its limits"""
+    failures = []
+    for sizes in report:
+        budget = budget_for(budgets, sizes['page'])
+        for metric in METRICS:
+            limit_kb = budget.get(f'{metric}_kb')
+            if limit_kb is not None and sizes[metric] > limit_kb * 1024:
+                failures.append(f"{sizes['page']}: {metric} {sizes[metric] / 1024:.0f}kb > budget {limit_kb}kb")
+        max_requests = budget.get('requests')
+        if max_requests is not None and sizes['requests'] > max_requests:
+            failures.append(f"{sizes['page']}: {sizes['requests']} requests > budget {max_requests}")
+    return failures
+
+
+########################################################
+#       cli
+########################################################
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='report and enforce per-page transfer budgets')
+    parser.add_argument('--config', default=BUDGET_CONFIG, help=f'budget config (default: {BUDGET_CONFIG})')
+    parser.add_argument('--report-only', action='store_true', help='print the report without enforcing budgets')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args()
+
+    graph = build_graph()
+    gzip_cache: Dict[str, int] = {}
+    pages = [p for p in graph['sources'] if p.endswith('.html') and not p.startswith('shared/')]
+    report = sorted((page_sizes(graph, page, gzip_cache) for page in pages), key=lambda s: s['raw'], reverse=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"\n👾 {'page':<28}{'requests':>10}{'raw':>12}{'gzip':>12}{'gzip+webp':>12}")
+        for sizes in report:
+            print(f"   {sizes['page']:<28}{sizes['requests']:>10}"
+                  f"{sizes['raw'] / 1024:>10.0f}kb{sizes['gzip'] / 1024:>10.0f}kb{sizes['webp'] / 1024:>10.0f}kb")
+
+    if args.report_only:
+        return 0
+    failures = check_budgets(report, load_budgets(args.config))
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        return 1
+    print("\n✅ all pages within budget\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
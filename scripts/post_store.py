@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+structured post store for loyal.love-website
+every post is a record in posts/<post id>.html: front matter (location, date,
+astro status, side, page, title, description, image) followed by the post's
+markup. the records are the source of truth: pages are only ever rendered
+from them, into the frame (head, non-post content and footer) of the page
+they live on, and edits made to posts straight in the html are overwritten.
+`post_store.py import` is the one-off migration that scrapes pages into
+records. frames and parsed records are cached by mtime, so feeds, rotation
+and search read records instead of re-parsing every page
+"""
+
+import os
+import re
+import sys
+import argparse
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from html_utils import find_tags, get_attr, resolve_local_path, relative_reference
+from instrument import span
+
+
+########################################################
+#       constants
+########################################################
+
+POSTS_DIR: str = 'posts'
+PAGE_GLOBS: List[str] = ['index.html', 'chapters/*.html']
+FIELDS: List[str] = ['id', 'date', 'page', 'location', 'side', 'astro_status', 'title', 'description', 'image']
+FRONT_MATTER_FENCE: str = '---'
+# front matter fields holding a url relative to the post's page
+PATH_FIELDS: List[str] = ['image']
+
+POST_BANNER = re.compile(r'[ \t]*<!--\s*\.+\s*-->\s*<!--[\s.]*POST[\s.]*-->\s*<!--\s*\.+\s*-->[ \t]*\n?')
+FOOTER_BANNER = re.compile(r'[ \t]*<!--\s*\.+\s*-->\s*<!--[\s.]*FOOTER[\s.]*-->\s*<!--\s*\.+\s*-->[ \t]*\n?')
+END_BANNER = re.compile(r'[ \t]*<!--[\s.]*END[\s.]*-->[ \t]*\n?')
+REFERENCE_PATTERN = re.compile(r'(\s(?:src|href|poster)\s*=\s*)(["\'])(.*?)\2', re.IGNORECASE | re.DOTALL)
+
+# the banners that have always been written around a post
+POST_OPENING: str = (
+    '    <!-- ............................................................................................................................................... -->\n'
+    '    <!-- .......................................       POST       ....................................................................................... -->\n'
+    '    <!-- ............................................................................................................................................... -->\n\n'
+)
+POST_CLOSING: str = (
+    '\n\n    <!-- .........................................................       END        ................................................................... -->\n\n'
+)
+
+_record_cache: Dict[str, Tuple[int, Dict]] = {}
+_frame_cache: Dict[str, Tuple[Tuple[int, int], Tuple[str, str]]] = {}
+
+
+########################################################
+#       splitting pages
+########################################################
+
+def post_date(post_id: str) -> Optional[date]:
+    """2025_august_18 -> date(2025, 8, 18)"""
+    try:
+        return datetime.strptime(post_id, '%Y_%B_%d').date()
+    except ValueError:
+        return None
+
+
+def split_posts(html: str) -> List[Dict]:
+    """every post on a page as {id, date, start, hr, end}
+
+    a post starts at the POST banner right above its <hr class="between-posts">
+    and runs up to the next post; the last one ends after its END banner (or
+    at the footer), so head + posts + tail always gives back the page.
+    """
+    hrs = [m for m in find_tags(html, 'hr')
+           if 'between-posts' in (get_attr(m.group(0), 'class') or '') and get_attr(m.group(0), 'id')]
+    banner_ends = {m.end(): m.start() for m in POST_BANNER.finditer(html)}
+    footer = FOOTER_BANNER.search(html)
+    footer_start = footer.start() if footer else len(html)
+
+    posts = []
+    for hr in hrs:
+        start = html.rfind('\n', 0, hr.start()) + 1
+        for banner_end, banner_start in banner_ends.items():
+            if banner_end <= start and not html[banner_end:start].strip():
+                start = banner_start
+        post_id = get_attr(hr.group(0), 'id')
+        posts.append({'id': post_id, 'date': post_date(post_id), 'start': start, 'hr': hr.start()})
+
+    for i, post in enumerate(posts):
+        if i + 1 < len(posts):
+            post['end'] = posts[i + 1]['start']
+            continue
+        end_banner = END_BANNER.search(html, post['hr'], footer_start)
+        end = end_banner.end() if end_banner else footer_start
+        while html[end:end + 1] == '\n':
+            end += 1
+        post['end'] = end
+    return posts
+
+
+def page_frame(html: str) -> Tuple[str, str]:
+    """(head, tail) around the posts; an empty page splits at its POST banner or footer"""
+    posts = split_posts(html)
+    if posts:
+        return html[:posts[0]['start']], html[posts[-1]['end']:]
+    marker = POST_BANNER.search(html) or FOOTER_BANNER.search(html)
+    position = marker.start() if marker else len(html)
+    return html[:position], html[position:]
+
+
+def cached_frame(page: str) -> Tuple[str, str]:
+    stat = os.stat(page)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _frame_cache.get(page)
+    if cached and cached[0] == key:
+        return cached[1]
+    with open(page, 'r', encoding='utf-8') as f:
+        frame = page_frame(f.read())
+    _frame_cache[page] = (key, frame)
+    return frame
+
+
+def rebase_reference(value: str, from_page: str, to_page: str) -> str:
+    """a relative url written on from_page, rewritten to resolve the same from to_page"""
+    if not value or value.startswith(('/', '#')) or re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*:', value):
+        return value
+    target = resolve_local_path(value, from_page)
+    if not target:
+        return value
+    suffix = value[len(value.split('#', 1)[0].split('?', 1)[0]):]
+    return f"{relative_reference(target, to_page)}{suffix}"
+
+
+def rebase_references(html: str, from_page: str, to_page: str) -> str:
+    """rewrite relative src/href/poster values so they resolve the same from to_page"""
+    def replace(match):
+        return f"{match.group(1)}{match.group(2)}{rebase_reference(match.group(3), from_page, to_page)}{match.group(2)}"
+    return REFERENCE_PATTERN.sub(replace, html)
+
+
+def move_post(post: Dict, to_page: str) -> Dict:
+    """the record of a post moved to another page, its body and path fields rebased onto it"""
+    moved = dict(post, page=to_page, body=rebase_references(post['body'], post['page'], to_page))
+    for field in PATH_FIELDS:
+        if moved.get(field):
+            moved[field] = rebase_reference(moved[field], post['page'], to_page)
+    return moved
+
+
+########################################################
+#       records
+########################################################
+
+def record_path(post_id: str, posts_dir: str = POSTS_DIR) -> str:
+    return os.path.join(posts_dir, f"{post_id}.html")
+
+
+def format_record(post: Dict) -> str:
+    lines = [FRONT_MATTER_FENCE]
+    for field in FIELDS:
+        value = post.get(field)
+        if value is not None and value != '':
+            lines.append(f"{field}: {' '.join(str(value).split())}")
+    lines.append(FRONT_MATTER_FENCE)
+    return '\n'.join(lines) + '\n' + post['body']
+
+
+def parse_record(text: str) -> Dict:
+    if not text.startswith(FRONT_MATTER_FENCE + '\n'):
+        raise ValueError('record does not start with front matter')
+    end = text.find('\n' + FRONT_MATTER_FENCE + '\n', len(FRONT_MATTER_FENCE))
+    if end == -1:
+        raise ValueError('front matter is not closed')
+    post = {}
+    for line in text[len(FRONT_MATTER_FENCE) + 1:end].splitlines():
+        key, _, value = line.partition(':')
+        post[key.strip()] = value.strip()
+    post['date'] = date.fromisoformat(post['date']) if post.get('date') else post_date(post['id'])
+    post['body'] = text[end + len(FRONT_MATTER_FENCE) + 2:]
+    return post
+
+
+def load_post(path: str) -> Dict:
+    mtime = os.stat(path).st_mtime_ns
+    cached = _record_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        post = parse_record(f.read())
+    post['mtime'] = mtime
+    _record_cache[path] = (mtime, post)
+    return post
+
+
+def load_posts(posts_dir: str = POSTS_DIR, page: Optional[str] = None) -> List[Dict]:
+    """every record (or the ones on one page), newest first"""
+    posts = []
+    for path in sorted(Path(posts_dir).glob('*.html')):
+        try:
+            post = load_post(str(path))
+        except (OSError, ValueError) as e:
+            print(f"❌ error reading {path}: {e}")
+            continue
+        if page is None or post.get('page') == page:
+            posts.append(post)
+    return sorted(posts, key=lambda p: (p['date'] or date.min, p['id']), reverse=True)
+
+
+def save_post(post: Dict, posts_dir: str = POSTS_DIR) -> str:
+    os.makedirs(posts_dir, exist_ok=True)
+    path = record_path(post['id'], posts_dir)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(format_record(post))
+    return path
+
+
+def delete_post(post_id: str, posts_dir: str = POSTS_DIR) -> None:
+    path = record_path(post_id, posts_dir)
+    _record_cache.pop(path, None)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+########################################################
+#       migration and render
+########################################################
+
+def record_from_html(segment: str, post_id: str, page: str) -> Dict:
+    """scrape a record out of a post's markup, reusing the rss extractor"""
+    from generate_rss import extract_post_data
+
+    scraped = extract_post_data(segment)
+    title_tag = re.search(r'<h2\b[^>]*class=["\'][^"\']*post-title[^>]*>(.*?)</h2\s*>', segment, re.DOTALL)
+    astro = re.search(r'<h6\b[^>]*class=["\'][^"\']*astro-status[^>]*>(.*?)</h6\s*>', segment, re.DOTALL)
+    side = re.search(r'post-title-(left|right)', segment)
+    title = scraped[0]['title'] if scraped else re.sub(r'<[^>]+>', '', title_tag.group(1)) if title_tag else ''
+    return {
+        'id': post_id,
+        # the date in the title is the one readers see, a few ids are off by a day or two
+        'date': scraped[0]['pubDate'].date() if scraped else post_date(post_id),
+        'page': page,
+        'location': title.split(';', 1)[0].strip() if ';' in title else '',
+        'side': side.group(1) if side else '',
+        'astro_status': re.sub(r'<[^>]+>', '', astro.group(1)) if astro else '',
+        'title': title,
+        'description': scraped[0]['description'] if scraped else '',
+        'image': (scraped[0]['image'] if scraped else '') or '',
+        'body': segment,
+    }
+
+
+def import_page(page: str, posts_dir: str = POSTS_DIR, save: bool = True) -> List[Dict]:
+    """migration: replace the records of a page with the posts scraped from its html,
+    returns them in page order. only run explicitly (`post_store.py import`), never by the build
+    """
+    with open(page, 'r', encoding='utf-8') as f:
+        html = f.read()
+    stale = {post['id'] for post in load_posts(posts_dir, page)}
+    records = []
+    for segment in split_posts(html):
+        stale.discard(segment['id'])
+        post = record_from_html(html[segment['start']:segment['end']], segment['id'], page)
+        if save:
+            save_post(post, posts_dir)
+        records.append(post)
+    if save:
+        for post_id in stale:
+            delete_post(post_id, posts_dir)
+    return records
+
+
+def render_page(page: str, posts_dir: str = POSTS_DIR) -> bool:
+    """write a page from its frame and records, returns whether it changed"""
+    posts = load_posts(posts_dir, page)
+    with open(page, 'r', encoding='utf-8') as f:
+        current = f.read()
+    on_page = split_posts(current)
+    if not posts and on_page and not any(os.path.exists(record_path(post['id'], posts_dir)) for post in on_page):
+        # never wipe the posts of a page that was not migrated yet
+        raise ValueError(f"{page} has posts but no records in {posts_dir}/, run `post_store.py import {page}` first")
+    head, tail = cached_frame(page)
+    html = head + ''.join(post['body'] for post in posts) + tail
+    if current == html:
+        return False
+    with open(page, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return True
+
+
+def find_pages() -> List[str]:
+    pages = set()
+    for pattern in PAGE_GLOBS:
+        pages.update(p.as_posix() for p in Path('.').glob(pattern))
+    return sorted(pages)
+
+
+def without_layout(html: str) -> str:
+    """markup with runs of whitespace made one space, and none next to a tag's brackets"""
+    return re.sub(r'\s*([<>])\s*', r'\1', ' '.join(html.split()))
+
+
+def adopt_formatting(page: str, posts_dir: str = POSTS_DIR) -> List[str]:
+    """take a formatter's layout changes to the posts on a page into their records, returns the ids updated
+
+    only changes to whitespace are taken, so the next render gives back the formatted
+    page, while any other edit made in the html is still overwritten by the record
+    """
+    with open(page, 'r', encoding='utf-8') as f:
+        html = f.read()
+    updated = []
+    for segment in split_posts(html):
+        path = record_path(segment['id'], posts_dir)
+        if not os.path.exists(path):
+            continue
+        post = load_post(path)
+        body = html[segment['start']:segment['end']]
+        if post.get('page') == page and body != post['body'] and without_layout(body) == without_layout(post['body']):
+            save_post(dict(post, body=body), posts_dir)
+            updated.append(segment['id'])
+    return updated
+
+
+def render_pages(pages: Optional[List[str]] = None, posts_dir: str = POSTS_DIR) -> List[str]:
+    """render pages (default: all of them) from the records, returns the ones that changed"""
+    rendered = []
+    for page in pages or find_pages():
+        with span('render page', page=page):
+            if render_page(page, posts_dir):
+                rendered.append(page)
+    return rendered
+
+
+def add_post(post_html: str, fields: Dict, page: str = 'index.html', posts_dir: str = POSTS_DIR) -> str:
+    """store a new post (generate_post_html markup) and render it onto its page"""
+    post = dict(fields, page=page, body=POST_OPENING + post_html.strip('\n').rstrip() + POST_CLOSING)
+    path = save_post(post, posts_dir)
+    render_page(page, posts_dir)
+    return path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='render pages from posts/, or migrate pages into it once with import')
+    parser.add_argument('command', choices=['import', 'render', 'list'],
+                        help='import replaces the records of the pages with what their html holds')
+    parser.add_argument('pages', nargs='*', help='pages to work on (default: index.html and chapters/)')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    pages = args.pages or find_pages()
+    if args.command == 'import':
+        for page in pages:
+            print(f"✓ {page}: {len(import_page(page))} posts")
+    elif args.command == 'render':
+        try:
+            rendered = render_pages(pages)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+        for page in pages:
+            print(f"{'✓ rendered' if page in rendered else '✓ up to date'} {page}")
+    else:
+        for post in load_posts():
+            print(f"{post['id']:<22} {post['page']:<26} {post['title']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
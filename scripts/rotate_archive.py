@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+archive rotation for loyal.love-website
+moves the records of posts older than the current season from index.html to
+their chapters/YY_season.html (creating it from the newest chapter when
+needed), renders both pages from the post store, keeps every post id, maps old index anchors to their chapter in
+chapters/anchors.json, and refreshes the footer season links and the rss feed
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from html_utils import get_attr, find_tags
+from post_store import cached_frame, load_posts, move_post, render_page, save_post
+
+
+########################################################
+#       constants
+########################################################
+
+INDEX_FILE: str = 'index.html'
+CHAPTERS_DIR: str = 'chapters'
+FOOTER_FILE: str = 'shared/footer.html'
+ANCHORS_FILE: str = 'chapters/anchors.json'
+# latest first; the boundaries match how the existing chapters were split by hand,
+# and winter is named after the year it starts in (24_winter runs into 2025)
+SEASON_STARTS: List[Tuple[str, int, int]] = [
+    ('winter', 12, 21), ('autumn', 9, 22), ('summer', 6, 1), ('spring', 3, 23),
+]
+CHAPTER_PATTERN = re.compile(r'^(\d{2})_(winter|spring|summer|autumn)\.html$')
+SEASON_LINKS_PATTERN = re.compile(r'(<div class="footer-season-links">\n)(.*?)(\n</div>)', re.DOTALL)
+
+
+########################################################
+#       seasons
+########################################################
+
+def season_of(day: date) -> Tuple[int, str]:
+    """(year the season started in, season name)"""
+    for name, month, first_day in SEASON_STARTS:
+        if (day.month, day.day) >= (month, first_day):
+            return day.year, name
+    return day.year - 1, 'winter'
+
+
+def season_start(year: int, name: str) -> date:
+    month, first_day = next((m, d) for season, m, d in SEASON_STARTS if season == name)
+    return date(year, month, first_day)
+
+
+def chapter_file(year: int, name: str) -> str:
+    return f"{CHAPTERS_DIR}/{year % 100:02d}_{name}.html"
+
+
+def season_label(year: int, name: str) -> str:
+    return f"{year}; {name}"
+
+
+def chapter_season(filename: str) -> Optional[Tuple[int, str]]:
+    match = CHAPTER_PATTERN.match(os.path.basename(filename))
+    return (2000 + int(match.group(1)), match.group(2)) if match else None
+
+
+########################################################
+#       posts
+########################################################
+
+def new_chapter(year: int, name: str, template_path: str) -> str:
+    """an empty chapter page with the head, title and footer of an existing one"""
+    head, tail = cached_frame(template_path)
+    label = season_label(year, name)
+    head = re.sub(r'(<title>[^<]*- )[^<]*(</title>)', rf'\g<1>{label}\g<2>', head)
+    head = re.sub(r'(<h1 class="chapter-title">)[^<]*(</h1>)', rf'\g<1>{label}\g<2>', head)
+    return head + tail
+
+
+########################################################
+#       footer, anchors and rss
+########################################################
+
+def chapter_files() -> List[str]:
+    """chapters/YY_season.html files, newest season first"""
+    files = [p.as_posix() for p in Path(CHAPTERS_DIR).glob('*.html') if chapter_season(p.name)]
+    return sorted(files, key=lambda f: season_start(*chapter_season(f)), reverse=True)
+
+
+def update_footer(current: Tuple[int, str], footer_path: str = FOOTER_FILE) -> bool:
+    """label the front page with the current season and link every chapter"""
+    with open(footer_path, 'r', encoding='utf-8') as f:
+        footer = f.read()
+    match = SEASON_LINKS_PATTERN.search(footer)
+    if not match:
+        print(f"⚠️  no footer-season-links in {footer_path}, footer not updated")
+        return False
+    index_link = next(find_tags(match.group(2), 'a'), None)
+    index_href = get_attr(index_link.group(0), 'href') if index_link else 'https://www.loyal.love'
+    links = [f'  <a href="{index_href}" class="footer-season-link">{season_label(*current)}</a>']
+    for path in chapter_files():
+        if chapter_season(path) != current:
+            links.append(f'  <a href="/{path}" class="footer-season-link">{season_label(*chapter_season(path))}</a>')
+    updated = footer[:match.start(2)] + '\n'.join(links) + footer[match.end(2):]
+    if updated == footer:
+        return False
+    with open(footer_path, 'w', encoding='utf-8') as f:
+        f.write(updated)
+    return True
+
+
+def write_anchors(anchors_path: str = ANCHORS_FILE) -> Dict[str, str]:
+    """{post id: chapter file} so old index.html#post links can follow the post"""
+    chapters = chapter_files()
+    anchors = {post['id']: os.path.basename(post['page']) for post in load_posts() if post['page'] in chapters}
+    with open(anchors_path, 'w', encoding='utf-8') as f:
+        json.dump(anchors, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return anchors
+
+
+########################################################
+#       rotation
+########################################################
+
+def rotate(today: date, index_path: str = INDEX_FILE, dry_run: bool = False) -> Dict[str, List[str]]:
+    """move every index post older than the current season, returns {chapter: [post ids]}"""
+    current = season_of(today)
+    moves: Dict[str, List[Dict]] = {}
+    for post in load_posts(page=index_path):
+        if post['date'] and post['date'] < season_start(*current):
+            moves.setdefault(chapter_file(*season_of(post['date'])), []).append(post)
+    if not moves:
+        return {}
+
+    for chapter, posts in sorted(moves.items()):
+        for post in posts:
+            print(f"📦 {post['id']} → {chapter}")
+    if dry_run:
+        return {chapter: [post['id'] for post in posts] for chapter, posts in moves.items()}
+
+    for chapter, posts in moves.items():
+        if not os.path.exists(chapter):
+            existing = chapter_files()
+            if not existing:
+                raise FileNotFoundError(f"no chapter in {CHAPTERS_DIR}/ to use as a template for {chapter}")
+            with open(chapter, 'w', encoding='utf-8') as f:
+                f.write(new_chapter(*season_of(posts[0]['date']), existing[0]))
+            print(f"✨ created {chapter} from {existing[0]}")
+        for post in posts:
+            moved = move_post(post, chapter)
+            save_post(dict(moved, body=moved['body'].rstrip() + '\n\n'))
+        render_page(chapter)
+    render_page(index_path)
+
+    update_footer(current)
+    write_anchors()
+    return {chapter: [post['id'] for post in posts] for chapter, posts in moves.items()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='move posts from past seasons out of index.html')
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(),
+                        help='rotate as if it were this day (YYYY-MM-DD)')
+    parser.add_argument('--index', default=INDEX_FILE, help=f'front page (default: {INDEX_FILE})')
+    parser.add_argument('--dry-run', action='store_true', help='only print what would move')
+    parser.add_argument('--no-rss', action='store_true', help='do not regenerate rss.xml')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        moved = rotate(args.today, args.index, args.dry_run)
+    except (OSError, ValueError) as e:
+        print(f"❌ error rotating {args.index}: {e}")
+        return 1
+
+    if not moved:
+        print(f"✅ nothing to rotate, every post in {args.index} is from {season_label(*season_of(args.today))}")
+        return 0
+    total = sum(len(ids) for ids in moved.values())
+    if args.dry_run:
+        print(f"\n👾 {total} posts would move (dry run)")
+        return 0
+    if not args.no_rss:
+        from generate_rss import generate_rss
+        generate_rss()
+    print(f"\n✅ moved {total} posts into {len(moved)} chapters")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,15 +9,9 @@ success() {
 }
 
 run_lint() {
-    log "👾 fixing links in html files..."
-    node scripts/fix_links.js
-    
-    log "👾 formatting html files..."
-    npx prettier --write --config .github/workflows/.prettierrc.json "index.html" "chapters/*.html" "shared/*.html"
-    
-    log "👾 linting html files..."
-    npx html-validate --config "$(pwd)/.github/workflows/.htmlvalidate.json" "index.html" "chapters/*.html" "shared/*.html"
-    
+    log "👾 fixing links, formatting and linting changed html files..."
+    python3 scripts/lint.py "$@" || return 1
+
     success "✅ linting completed"
 }
 
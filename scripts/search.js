@@ -0,0 +1,101 @@
+// client for the search index written by scripts/search_index.py
+// docs.json lists the posts, shards/<first letter>.json hold the postings for terms
+const searchIndex = { meta: null, shards: {} };
+
+async function loadSearchMeta() {
+  if (!searchIndex.meta) {
+    const response = await fetch('/search/docs.json');
+    if (!response.ok) throw new Error('search index not found, run make build');
+    searchIndex.meta = await response.json();
+  }
+  return searchIndex.meta;
+}
+
+async function loadSearchShard(key) {
+  if (!(key in searchIndex.shards)) {
+    const response = await fetch(`/search/shards/${key}.json`);
+    searchIndex.shards[key] = response.ok ? await response.json() : {};
+  }
+  return searchIndex.shards[key];
+}
+
+// same folding as tokenize() in search_index.py; the last word may still be typed, keep it
+function searchTokens(query, meta) {
+  const folded = query.toLowerCase().normalize('NFKD').replace(/[\u0300-\u036f]/g, '');
+  const tokens = (folded.match(/[a-z0-9]+/g) || []).filter((token) => token.length >= meta.min_token_length);
+  return tokens.filter((token, i) => i === tokens.length - 1 || !meta.stop_words.includes(token));
+}
+
+// every word must match; each one also matches longer terms it is a prefix of
+async function searchPosts(query, limit = 20) {
+  const meta = await loadSearchMeta();
+  const tokens = searchTokens(query, meta);
+  if (!tokens.length) return [];
+
+  let scores = null;
+  for (const token of tokens) {
+    const key = token.slice(0, meta.prefix_length);
+    const shard = meta.shards.includes(key) ? await loadSearchShard(key) : {};
+    const tokenScores = new Map();
+    for (const [term, postings] of Object.entries(shard)) {
+      if (!term.startsWith(token)) continue;
+      const idf = Math.log(1 + meta.docs.length / postings.length);
+      for (const [doc, count] of postings) {
+        tokenScores.set(doc, (tokenScores.get(doc) || 0) + count * idf);
+      }
+    }
+    if (scores === null) {
+      scores = tokenScores;
+    } else {
+      for (const doc of scores.keys()) {
+        if (tokenScores.has(doc)) scores.set(doc, scores.get(doc) + tokenScores.get(doc));
+        else scores.delete(doc);
+      }
+    }
+    if (!scores.size) return [];
+  }
+
+  return [...scores.entries()]
+    .sort((a, b) => b[1] - a[1])
+    .slice(0, limit)
+    .map(([doc, score]) => {
+      const [id, title, url, date] = meta.docs[doc];
+      return { id, title, url, date, score };
+    });
+}
+
+function renderSearchResults(container, results, query) {
+  container.innerHTML = '';
+  if (!query.trim()) return;
+  if (!results.length) {
+    container.innerHTML = '<li class="footer-search-empty">nothing found</li>';
+    return;
+  }
+  for (const result of results) {
+    const item = document.createElement('li');
+    const link = document.createElement('a');
+    link.href = result.url;
+    link.textContent = result.title;
+    item.appendChild(link);
+    container.appendChild(item);
+  }
+}
+
+function setupSearch(input) {
+  const container = document.getElementById('post-search-results');
+  if (!container || input.dataset.searchReady) return;
+  input.dataset.searchReady = 'true';
+  let timer = null;
+  const run = async () => {
+    try {
+      renderSearchResults(container, await searchPosts(input.value), input.value);
+    } catch (error) {
+      console.error('Error searching posts:', error);
+    }
+  };
+  input.addEventListener('input', () => {
+    clearTimeout(timer);
+    timer = setTimeout(run, 150);
+  });
+  run();
+}
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+build-time full-text search index for loyal.love-website
+tokenizes every post in the post store (the title extract_post_data scraped
+plus the post's full text) into an inverted index sharded by the first letter of each term,
+so the client only fetches the shard a query needs and can match prefixes.
+pages whose posts did not change reuse their tokens from .cache/
+"""
+
+import os
+import re
+import sys
+import json
+import gzip
+import html
+import hashlib
+import argparse
+import unicodedata
+from pathlib import Path
+from typing import Dict, List
+
+from post_store import load_posts
+
+
+########################################################
+#       constants
+########################################################
+
+SEARCH_DIR: str = 'search'
+DOCS_FILE: str = 'docs.json'
+SHARDS_DIR: str = 'shards'
+CACHE_FILE: str = '.cache/search-pages.json'
+CACHE_VERSION: int = 1
+SHARD_PREFIX_LENGTH: int = 1
+MIN_TOKEN_LENGTH: int = 2
+TITLE_WEIGHT: int = 3
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'if', 'in', 'into', 'is', 'it',
+    'its', 'me', 'my', 'of', 'on', 'or', 'so', 'that', 'the', 'their', 'then', 'there', 'this', 'to', 'was',
+    'we', 'were', 'will', 'with', 'you', 'your',
+}
+
+
+########################################################
+#       tokens
+########################################################
+
+def tokenize(text: str) -> List[str]:
+    """lowercase ascii words, accents folded (zürich -> zurich), stop words dropped"""
+    folded = unicodedata.normalize('NFKD', text.lower()).encode('ascii', 'ignore').decode('ascii')
+    return [token for token in TOKEN_PATTERN.findall(folded)
+            if len(token) >= MIN_TOKEN_LENGTH and token not in STOP_WORDS]
+
+
+def post_text(body: str) -> str:
+    """the visible text of a post's markup"""
+    body = re.sub(r'<(script|style)\b.*?</\1\s*>|<!--.*?-->', ' ', body, flags=re.DOTALL | re.IGNORECASE)
+    return html.unescape(re.sub(r'<[^>]+>', ' ', body))
+
+
+def post_url(post: Dict) -> str:
+    return f"/#{post['id']}" if post['page'] == 'index.html' else f"/{post['page']}#{post['id']}"
+
+
+def page_documents(posts: List[Dict]) -> List[Dict]:
+    """one search document per post, with term counts"""
+    documents = []
+    for post in posts:
+        terms: Dict[str, int] = {}
+        for token in tokenize(post.get('title', '')):
+            terms[token] = terms.get(token, 0) + TITLE_WEIGHT
+        for token in tokenize(post_text(post.get('body', ''))):
+            terms[token] = terms.get(token, 0) + 1
+        documents.append({
+            'id': post['id'],
+            'title': post.get('title', ''),
+            'url': post_url(post),
+            'date': post['date'].isoformat() if post.get('date') else '',
+            'terms': terms,
+        })
+    return documents
+
+
+def page_hash(posts: List[Dict]) -> str:
+    digest = hashlib.sha256()
+    for post in posts:
+        for field in ('id', 'page', 'date', 'title', 'body'):
+            digest.update(f"{post.get(field, '')}\0".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def shard_key(term: str) -> str:
+    return term[:SHARD_PREFIX_LENGTH]
+
+
+########################################################
+#       index
+########################################################
+
+def load_cache(cache_path: str) -> Dict:
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'version': CACHE_VERSION, 'pages': {}}
+
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """write data and its .gz, leaving both untouched (and cacheable) when equal"""
+    if path.exists() and path.read_bytes() == data:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    path.with_name(path.name + '.gz').write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+    return True
+
+
+def encode(value) -> bytes:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+
+def build_search_index(build_dir: str, cache_path: str = CACHE_FILE) -> Dict:
+    """write docs.json and one shard per term prefix into build_dir/search/"""
+    pages: Dict[str, List[Dict]] = {}
+    for post in load_posts():
+        pages.setdefault(post['page'], []).append(post)
+
+    cache = load_cache(cache_path)
+    retokenized = []
+    for page, posts in pages.items():
+        digest = page_hash(posts)
+        if cache['pages'].get(page, {}).get('hash') != digest:
+            cache['pages'][page] = {'hash': digest, 'documents': page_documents(posts)}
+            retokenized.append(page)
+    for page in set(cache['pages']) - set(pages):
+        del cache['pages'][page]
+
+    documents = sorted((doc for entry in cache['pages'].values() for doc in entry['documents']),
+                       key=lambda doc: (doc['date'], doc['id']), reverse=True)
+    shards: Dict[str, Dict[str, List[List[int]]]] = {}
+    for number, doc in enumerate(documents):
+        for term, count in doc['terms'].items():
+            shards.setdefault(shard_key(term), {}).setdefault(term, []).append([number, count])
+
+    root = Path(build_dir) / SEARCH_DIR
+    written = 0
+    for key, postings in shards.items():
+        written += write_if_changed(root / SHARDS_DIR / f"{key}.json", encode(postings))
+    for stale in (root / SHARDS_DIR).glob('*.json*'):
+        if stale.name.split('.', 1)[0] not in shards:
+            stale.unlink()
+    meta = {
+        'docs': [[doc['id'], doc['title'], doc['url'], doc['date']] for doc in documents],
+        'shards': sorted(shards),
+        'prefix_length': SHARD_PREFIX_LENGTH,
+        'min_token_length': MIN_TOKEN_LENGTH,
+        'stop_words': sorted(STOP_WORDS),
+    }
+    written += write_if_changed(root / DOCS_FILE, encode(meta))
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+
+    shard_sizes = [len(encode(postings)) for postings in shards.values()]
+    return {
+        'documents': len(documents),
+        'terms': sum(len(postings) for postings in shards.values()),
+        'shards': len(shards),
+        'largest_shard': max(shard_sizes, default=0),
+        'retokenized': sorted(retokenized),
+        'written': written,
+    }
+
+
+def main() -> int:
+    from build_pages import BUILD_DIR
+
+    parser = argparse.ArgumentParser(description='build the search index for every post')
+    parser.add_argument('--output', default=BUILD_DIR, help=f'build directory (default: {BUILD_DIR})')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    stats = build_search_index(args.output)
+    print(f"✅ indexed {stats['documents']} posts, {stats['terms']} terms in {stats['shards']} shards "
+          f"(largest {stats['largest_shard'] / 1024:.1f}kb, {stats['written']} files written)")
+    if stats['retokenized']:
+        print(f"   re-tokenized: {', '.join(stats['retokenized'])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,13 +11,219 @@ import mimetypes
 from pathlib import Path
 import time
 import io
+import re
 import sys
+import signal
+import threading
+import functools
+import contextlib
+import urllib.parse
+
+from fingerprint import FINGERPRINT_PATTERN
+from html_utils import find_tags, get_attr, resolve_local_path
+from instrument import add_profile_argument, profile, span
+
+LIVE_RELOAD_PATH = '/__livereload'
+LIVE_RELOAD_SCRIPT = (
+    "<script>new EventSource('" + LIVE_RELOAD_PATH + "').onmessage = () => location.reload()</script>"
+)
+
+PRELOAD_TYPES = {'.css': 'style', '.js': 'script'}
+# big downloads that give way to pages, styles and scripts when the server is busy
+MEDIA_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.mp4', '.mov', '.webm', '.mp3', '.pdf')
+
+
+########################################################
+#           preload hints
+########################################################
+
+def critical_resources(html, page):
+    """(url, as) for what a page needs to render: stylesheets, scripts and its first image"""
+    found = []
+
+    def add(reference, kind):
+        path = resolve_local_path(reference, page)
+        if path and kind and ('/' + path, kind) not in found:
+            found.append(('/' + path, kind))
+
+    for match in find_tags(html, 'link'):
+        tag = match.group(0)
+        rel = (get_attr(tag, 'rel') or '').lower()
+        if rel == 'stylesheet':
+            add(get_attr(tag, 'href'), 'style')
+        elif rel == 'preload':
+            add(get_attr(tag, 'href'), get_attr(tag, 'as'))
+    for match in find_tags(html, 'script'):
+        tag = match.group(0)
+        if get_attr(tag, 'async') is None:
+            add(get_attr(tag, 'src'), 'script')
+    # the first post image is above the fold, later ones are lazy loaded anyway
+    body = html.find('<body')
+    first_image = next(find_tags(html[body:] if body != -1 else html, 'img'), None)
+    if first_image:
+        tag = first_image.group(0)
+        src = get_attr(tag, 'src')
+        add(get_attr(tag, 'data-src') if not src or src.startswith('data:') else src, 'image')
+    return found
+
+
+def link_header(resources):
+    return ', '.join(f'<{url}>; rel=preload; as={kind}' for url, kind in resources)
+
 
 ########################################################
 #           main class and methods
 ########################################################
 
+class LiveReload:
+    """tells open pages (over server-sent events) to reload after a rebuild"""
+
+    def __init__(self):
+        self.generation = 0
+        self.condition = threading.Condition()
+
+    def notify(self):
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def stream(self, handler):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.end_headers()
+        handler.close_connection = True
+        seen = self.generation
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.generation != seen, timeout=15)
+                    changed = self.generation != seen
+                    seen = self.generation
+                handler.wfile.write(b'data: reload\n\n' if changed else b': keepalive\n\n')
+                handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class PackBody:
+    """a body sliced out of the mapped --pack archive, written to the socket without a copy"""
+
+    def __init__(self, view):
+        self.view = view
+
+    def close(self):
+        self.view.release()
+
+
+########################################################
+#           admission control
+########################################################
+
+def is_media(path):
+    return path.lower().split('?', 1)[0].endswith(MEDIA_EXTENSIONS)
+
+
+class Admission:
+    """decides whether a request is served now, shed with a 503 or slowed down with a 429.
+    media only gets media_share of the connection and byte budgets, so under load images
+    and videos are turned away first while pages keep loading. 0 turns a limit off"""
+
+    def __init__(self, max_connections=0, max_inflight_bytes=0, rate=0.0, burst=0, media_share=0.5, retry_after=2):
+        self.max_connections = max_connections
+        self.max_inflight_bytes = max_inflight_bytes
+        self.rate = rate
+        self.burst = burst or max(1, int(rate * 2))
+        self.media_share = media_share
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.inflight_bytes = 0
+        self.buckets = {}
+        self.counts = {'served': 0, 'shed': 0, 'rate limited': 0, 'broken pipes': 0}
+
+    def connect(self):
+        with self.lock:
+            self.connections += 1
+
+    def disconnect(self):
+        with self.lock:
+            self.connections -= 1
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def wait_for_token(self, client, now):
+        """token bucket per client address, seconds until the next request is allowed"""
+        tokens, last = self.buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self.buckets[client] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self.buckets[client] = (tokens - 1, now)
+        if len(self.buckets) > 10000:
+            # forget clients whose bucket has filled up again
+            idle = self.burst / self.rate
+            self.buckets = {key: value for key, value in self.buckets.items() if now - value[1] < idle}
+        return 0
+
+    def admit(self, client, path):
+        """None to serve the request, otherwise (status, retry after seconds)"""
+        share = self.media_share if is_media(path) else 1.0
+        with self.lock:
+            if self.rate:
+                wait = self.wait_for_token(client, time.monotonic())
+                if wait:
+                    self.counts['rate limited'] += 1
+                    return 429, max(1, int(wait + 0.999))
+            if (self.max_connections and self.connections > self.max_connections * share) or \
+                    (self.max_inflight_bytes and self.inflight_bytes >= self.max_inflight_bytes * share):
+                self.counts['shed'] += 1
+                return 503, self.retry_after
+            self.counts['served'] += 1
+        return None
+
+    @contextlib.contextmanager
+    def sending(self, size):
+        with self.lock:
+            self.inflight_bytes += size
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.inflight_bytes -= size
+
+    def summary(self):
+        return ', '.join(f"{count} {name}" for name, count in self.counts.items())
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # the default of 5 drops connections during a burst, and dropped SYNs are only retried after a second
+    request_queue_size = 128
+    admission = None
+
+    def process_request(self, request, client_address):
+        if self.admission:
+            self.admission.connect()
+        super().process_request(request, client_address)
+
+    def shutdown_request(self, request):
+        super().shutdown_request(request)
+        if self.admission:
+            self.admission.disconnect()
+
+
 class EnhancedHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    live_reload = None
+    pack = None
+    early_hints = False
+    preload = None
+    gzip_cache = {}
+    gzip_cache_lock = threading.Lock()
+    preload_cache = {}
+
     def __init__(self, *args, **kwargs):
         mimetypes.add_type('text/css', '.css')
         mimetypes.add_type('application/javascript', '.js')
@@ -27,16 +233,114 @@ class EnhancedHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def handle_one_request(self):
         """Override to handle broken pipe errors gracefully"""
         try:
-            super().handle_one_request()
+            with span('request') as timing:
+                super().handle_one_request()
+                timing.set(path=getattr(self, 'path', ''))
         except (BrokenPipeError, ConnectionResetError) as e:
-            pass
+            self.count_broken_pipe()
         except Exception as e:
             if hasattr(self, 'log_error'):
                 self.log_error(f"Unexpected error: {e}")
             else:
                 print(f"Unexpected error: {e}", file=sys.stderr)
 
+    @classmethod
+    def clear_caches(cls):
+        with cls.gzip_cache_lock:
+            cls.gzip_cache.clear()
+            cls.preload_cache.clear()
+
+    def compressed(self, path, stat):
+        """gzip body for a file without a fresh .gz next to it, cached by mtime"""
+        with self.gzip_cache_lock:
+            cached = self.gzip_cache.get(path)
+        if cached and cached[0] == (stat.st_mtime, stat.st_size):
+            return cached[1]
+        with span('gzip', path=path), open(path, 'rb') as f:
+            data = gzip.compress(f.read())
+        with self.gzip_cache_lock:
+            self.gzip_cache[path] = ((stat.st_mtime, stat.st_size), data)
+        return data
+
+    def preload_links(self, path, stat):
+        """Link header value for an html file, cached by mtime like the gzip bodies"""
+        with self.gzip_cache_lock:
+            cached = self.preload_cache.get(path)
+        if cached and cached[0] == (stat.st_mtime, stat.st_size):
+            return cached[1]
+        with span('preload scan', path=path):
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                html = f.read()
+            page = os.path.relpath(path, self.directory).replace(os.sep, '/')
+            links = link_header(critical_resources(html, page))
+        with self.gzip_cache_lock:
+            self.preload_cache[path] = ((stat.st_mtime, stat.st_size), links)
+        return links
+
+    def send_early_hints(self, links):
+        """103 before the page, so the browser fetches css and js while the html is read;
+        http/1.0 clients do not expect interim responses and never get one"""
+        if not (self.early_hints and links and self.request_version == 'HTTP/1.1'):
+            return
+        self.send_response_only(103, 'Early Hints')
+        self.send_header('Link', links)
+        http.server.BaseHTTPRequestHandler.end_headers(self)
+
+    def count_broken_pipe(self):
+        if self.server.admission:
+            self.server.admission.count('broken pipes')
+
+    def shed(self):
+        """answer straight away with a 503 or 429 when admission control turns the request down"""
+        admission = self.server.admission
+        rejected = admission and admission.admit(self.client_address[0], self.path)
+        if not rejected:
+            return False
+        status, retry_after = rejected
+        self.close_connection = True
+        self.send_response(status)
+        self.send_header('Retry-After', str(retry_after))
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Content-Length', '0')
+        self.send_header('Connection', 'close')
+        # skip the caching headers of end_headers, a refusal must not be cached as the page
+        http.server.BaseHTTPRequestHandler.end_headers(self)
+        return True
+
+    def do_GET(self):
+        if self.live_reload and self.path == LIVE_RELOAD_PATH:
+            self.live_reload.stream(self)
+            return
+        if self.shed():
+            return
+        super().do_GET()
+
+    def do_HEAD(self):
+        if self.shed():
+            return
+        super().do_HEAD()
+
+    def send_live_page(self, path, stat, content_type, can_gzip):
+        """html with the live reload hook appended, used in --watch mode"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        hook = LIVE_RELOAD_SCRIPT.encode('utf-8')
+        closing = data.rfind(b'</body>')
+        data = data[:closing] + hook + data[closing:] if closing != -1 else data + hook
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        if can_gzip:
+            data = gzip.compress(data, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Last-Modified', self.date_time_string(stat.st_mtime))
+        self.end_headers()
+        return io.BytesIO(data)
+
     def end_headers(self):
+        if self.preload:
+            self.send_header('Link', self.preload)
+            self.preload = None
         # add security headers
         self.send_header('X-Content-Type-Options', 'nosniff')
         self.send_header('X-Frame-Options', 'DENY')
@@ -48,10 +352,19 @@ class EnhancedHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
 
     def add_caching_headers(self):
         """Add appropriate caching headers based on file type"""
-        path = self.path.lower()
+        path = self.path.lower().split('?', 1)[0]
         
+        # Live reload and anything served while watching must never be cached
+        if self.live_reload:
+            self.send_header('Cache-Control', 'no-cache')
+
+        # Fingerprinted assets - the url changes with the content, cache forever
+        elif FINGERPRINT_PATTERN.search(path):
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+            self.send_header('Expires', self.date_time_string(time.time() + 31536000))
+
         # Images - cache for 1 year
-        if any(ext in path for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.ico']):
+        elif any(ext in path for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.ico']):
             self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
             self.send_header('Expires', self.date_time_string(time.time() + 31536000))
         
@@ -70,14 +383,55 @@ class EnhancedHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             self.send_header('Cache-Control', 'public, max-age=86400')
             self.send_header('Expires', self.date_time_string(time.time() + 86400))
 
+    def send_packed(self):
+        """serve from the --pack archive: one lookup, headers worked out at pack time, body sliced from the mmap"""
+        url_path = urllib.parse.unquote(self.path.split('?', 1)[0].split('#', 1)[0])
+        entry = self.pack.lookup(url_path)
+        if entry is None:
+            if self.pack.is_directory(url_path):
+                self.send_response(301)
+                self.send_header('Location', url_path + '/')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+            self.send_error(404, "File not found")
+            return None
+
+        headers = dict(entry['headers'])
+        body = entry['identity']
+        if entry['gzip'] and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = entry['gzip']
+            headers['Content-Encoding'] = 'gzip'
+            headers['ETag'] = headers['ETag'][:-1] + '-gz"'
+        self.preload = headers.pop('Link', None)
+        if self.headers.get('If-None-Match') == headers['ETag']:
+            self.send_response(304)
+            self.send_header('ETag', headers['ETag'])
+            self.end_headers()
+            return None
+
+        self.send_early_hints(self.preload)
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if entry['gzip']:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Content-Length', str(body[1]))
+        self.end_headers()
+        return PackBody(self.pack.body(body))
+
     def send_head(self):
         """Override send_head to add compression support"""
+        self.preload = None
+        if self.pack:
+            return self.send_packed()
         path = self.translate_path(self.path)
         
         if os.path.isdir(path):
             if not self.path.endswith('/'):
                 self.send_response(301)
                 self.send_header('Location', self.path + '/')
+                self.send_header('Content-Length', '0')
                 self.end_headers()
                 return None
             for index in "index.html", "index.htm":
@@ -99,6 +453,20 @@ class EnhancedHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         mtime = self.date_time_string(stat.st_mtime)
         
         content_type = self.guess_type(path)
+
+        if content_type == 'text/html':
+            try:
+                self.preload = self.preload_links(path, stat)
+            except OSError:
+                self.preload = None
+            self.send_early_hints(self.preload)
+
+        if self.live_reload and content_type == 'text/html':
+            try:
+                return self.send_live_page(path, stat, content_type, can_gzip)
+            except OSError as e:
+                self.send_error(500, f"❌ error reading file: {e}")
+                return None
         
         should_compress = can_gzip and content_type in [
             'text/html', 'text/css', 'application/javascript', 
@@ -107,7 +475,7 @@ class EnhancedHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         
         if should_compress:
             gzip_path = path + '.gz'
-            if os.path.exists(gzip_path):
+            if os.path.exists(gzip_path) and os.stat(gzip_path).st_mtime >= stat.st_mtime:
                 try:
                     with open(gzip_path, 'rb') as f:
                         data = f.read()
@@ -123,9 +491,7 @@ class EnhancedHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                     return None
             else:
                 try:
-                    with open(path, 'rb') as f:
-                        data = f.read()
-                    compressed_data = gzip.compress(data)
+                    compressed_data = self.compressed(path, stat)
                     self.send_response(200)
                     self.send_header('Content-Type', content_type)
                     self.send_header('Content-Length', str(len(compressed_data)))
@@ -143,6 +509,7 @@ class EnhancedHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 self.send_header('Content-Type', content_type)
                 self.send_header('Content-Length', str(stat.st_size))
                 self.send_header('Last-Modified', mtime)
+                self.end_headers()
                 return f
             except OSError as e:
                 self.send_error(404, f"❌ file not found: {e}")
@@ -150,11 +517,16 @@ class EnhancedHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
 
     def copyfile(self, source, output):
         """Override copyfile to handle broken pipe errors"""
+        admission = self.server.admission
         try:
-            super().copyfile(source, output)
+            with span('send body'), admission.sending(body_size(source)) if admission else contextlib.nullcontext():
+                if isinstance(source, PackBody):
+                    output.write(source.view)
+                else:
+                    super().copyfile(source, output)
         except (BrokenPipeError, ConnectionResetError) as e:
-            # Don't log these common disconnections - they're normal
-            pass
+            # Don't log these common disconnections - they're normal, just count them
+            self.count_broken_pipe()
         except Exception as e:
             if hasattr(self, 'log_error'):
                 self.log_error(f"❌ error during file transfer: {e}")
@@ -170,12 +542,23 @@ class EnhancedHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         super().log_message(format, *args)
 
 
-def create_gzip_files():
+def body_size(source):
+    if isinstance(source, PackBody):
+        return source.view.nbytes
+    if isinstance(source, io.BytesIO):
+        return source.getbuffer().nbytes
+    try:
+        return os.fstat(source.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return 0
+
+
+def create_gzip_files(root='.'):
     """Pre-compress static files for better performance"""
     static_extensions = ['.html', '.css', '.js', '.xml', '.txt']
     
     for ext in static_extensions:
-        for file_path in Path('.').rglob(f'*{ext}'):
+        for file_path in Path(root).rglob(f'*{ext}'):
             if file_path.is_file() and not file_path.name.endswith('.gz'):
                 gzip_path = file_path.with_suffix(file_path.suffix + '.gz')
                 if not gzip_path.exists() or gzip_path.stat().st_mtime < file_path.stat().st_mtime:
@@ -185,6 +568,32 @@ def create_gzip_files():
                     print(f"Created {gzip_path}")
 
 
+def start_watch_mode(repo_root, serve_root):
+    """rebuild what changed, drop cached responses and reload open pages on every edit"""
+    import build
+    from watch import start_watching
+
+    live_reload = LiveReload()
+    EnhancedHTTPRequestHandler.live_reload = live_reload
+    serving_build = os.path.abspath(serve_root) != os.path.abspath(repo_root)
+    lock = threading.Lock()
+
+    def on_change(paths):
+        with lock:
+            started = time.perf_counter()
+            names = ', '.join(sorted(os.path.relpath(p, repo_root) for p in paths)[:5])
+            print(f"\n👀 changed: {names}")
+            if serving_build:
+                build.build(['precompress'], os.path.relpath(serve_root, repo_root))
+            else:
+                build.build(['rss'])
+            EnhancedHTTPRequestHandler.clear_caches()
+            live_reload.notify()
+            print(f"✨ reloaded in {time.perf_counter() - started:.2f}s")
+
+    return start_watching(on_change)
+
+
 def main():
     import argparse
     
@@ -192,23 +601,78 @@ def main():
     parser.add_argument('--port', type=int, default=8000, help='Port to serve on (default: 8000)')
     parser.add_argument('--host', default='localhost', help='Host to bind to (default: localhost)')
     parser.add_argument('--precompress', action='store_true', help='Pre-compress static files')
+    parser.add_argument('--root', default='.', help='Directory to serve, relative to the repo (e.g. build)')
+    parser.add_argument('--watch', action='store_true', help='Rebuild on change and live-reload open pages')
+    parser.add_argument('--early-hints', action='store_true',
+                        help='Send 103 Early Hints with the preload links before html pages (HTTP/1.1 only)')
+    parser.add_argument('--pack', metavar='FILE',
+                        help='Serve a site archive from scripts/pack_site.py instead of a directory (SIGHUP reloads it)')
+    parser.add_argument('--max-connections', type=int, default=256,
+                        help='Open connections before new requests get a 503 (default: 256, 0 for no limit)')
+    parser.add_argument('--max-inflight-mb', type=float, default=256,
+                        help='Response megabytes being sent before new requests get a 503 (default: 256, 0 for no limit)')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Requests per second per client before a 429 (default: 0, no limit)')
+    parser.add_argument('--burst', type=int, default=0, help='Requests a client may make at once (default: 2x --rate)')
+    parser.add_argument('--media-share', type=float, default=0.5,
+                        help='Share of the limits images and videos may use, the rest is kept for pages (default: 0.5)')
+    parser.add_argument('--backlog', type=int, default=ThreadingHTTPServer.request_queue_size,
+                        help=f'Connections waiting to be accepted (default: {ThreadingHTTPServer.request_queue_size})')
+    add_profile_argument(parser)
     args = parser.parse_args()
+    if args.pack and args.watch:
+        parser.error('--pack serves a finished archive, it cannot be combined with --watch')
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(repo_root)
+    serve_root = os.path.abspath(args.root)
+    profile(args.profile, 'server')
+    # a terminated server shuts down like on ctrl+c, so a profile still gets written
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
     
     if args.precompress:
         print("Pre-compressing static files...")
-        create_gzip_files()
+        create_gzip_files(serve_root)
         print("Pre-compression complete!")
 
-    os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    os.chdir('..')
-    
-    with socketserver.TCPServer((args.host, args.port), EnhancedHTTPRequestHandler) as httpd:
+    if args.early_hints:
+        # interim responses only exist in http/1.1, which also keeps connections open
+        EnhancedHTTPRequestHandler.protocol_version = 'HTTP/1.1'
+        EnhancedHTTPRequestHandler.early_hints = True
+    if args.pack:
+        from pack_site import SitePack
+
+        def load_pack(*_):
+            try:
+                EnhancedHTTPRequestHandler.pack = SitePack(args.pack)
+            except (OSError, ValueError) as e:
+                print(f"❌ could not load {args.pack}: {e}")
+                if not EnhancedHTTPRequestHandler.pack:
+                    sys.exit(1)
+                return
+            pack = EnhancedHTTPRequestHandler.pack
+            print(f"📦 serving {len(pack.entries)} urls from {args.pack} (packed {pack.created})")
+
+        load_pack()
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, load_pack)
+
+    stop_watching = start_watch_mode(repo_root, serve_root) if args.watch else None
+    handler = functools.partial(EnhancedHTTPRequestHandler, directory=serve_root)
+    admission = Admission(args.max_connections, int(args.max_inflight_mb * 1048576), args.rate, args.burst,
+                          args.media_share)
+    ThreadingHTTPServer.request_queue_size = args.backlog
+
+    with ThreadingHTTPServer((args.host, args.port), handler) as httpd:
+        httpd.admission = admission
         print(f"✨ server running at http://{args.host}:{args.port}")
         print("(press Ctrl+C to stop)")
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
-            print("\n👋 shutting down server...")
+            print(f"\n👋 shutting down server... ({admission.summary()})")
+            if stop_watching:
+                stop_watching.set()
             httpd.shutdown()
 
 
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+synthetic corpus for loyal.love-website
+writes a copy of the site skeleton with N chapters of M posts each, rendered
+with generate_post_html and the post store banners, plus seeded placeholder
+images, so the pipeline can be measured at the size the zine will grow to
+"""
+
+import os
+import sys
+import random
+import shutil
+import argparse
+from datetime import date, timedelta
+from typing import Dict, List
+
+from generate_post import generate_post_html
+from post_store import POST_OPENING, POST_CLOSING, cached_frame, page_frame
+from rotate_archive import chapter_file, new_chapter, season_of, season_start
+
+
+########################################################
+#       constants
+########################################################
+
+REPO_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SKELETON: List[str] = ['index.html', 'shared', 'css', 'scripts/include.js', 'scripts/enhanced-lazy-load.js',
+                       'scripts/search.js']
+TEMPLATE_CHAPTER: str = 'chapters/25_summer.html'
+LATEST_SEASON: date = date(2025, 6, 1)
+SEASON_DAYS: int = 90
+WORDS: List[str] = (
+    'moon venus saturn mercury retrograde garden ocean kreuzberg waikiki north shore bitcoin cypherpunk '
+    'quantum qubit code dream lion dragon sun eclipse river forest library coffee midnight summer winter '
+    'spring autumn love family research legacy build ship write read travel home friend heart star light'
+).split()
+ASTRO: List[str] = ['☉ in ♌︎', '☽ in my 12th', '♂ ◼ ♅', '☿ retrograde', '♃ ☌ my ☊', '♄ direct']
+
+
+########################################################
+#       generation
+########################################################
+
+def sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def write_image(path: str, rng: random.Random, size: tuple) -> None:
+    """a noisy gradient, so encoders do real work instead of compressing a flat color"""
+    from PIL import Image
+
+    base = Image.linear_gradient('L').resize(size).convert('RGB')
+    noise = Image.effect_noise(size, rng.randint(20, 80)).convert('RGB')
+    tint = Image.new('RGB', size, tuple(rng.randint(0, 255) for _ in range(3)))
+    Image.blend(Image.blend(base, noise, 0.4), tint, 0.3).save(path, quality=95)
+
+
+def seasons(count: int) -> List[tuple]:
+    """(year, season) for the latest season and the count - 1 before it"""
+    result, day = [], LATEST_SEASON
+    while len(result) < count:
+        season = season_of(day)
+        if season not in result:
+            result.append(season)
+        day -= timedelta(days=SEASON_DAYS // 3)
+    return result
+
+
+def generate_corpus(root: str, chapters: int, posts_per_chapter: int, images_per_post: int = 1,
+                    image_size: tuple = (1600, 1200), seed: int = 42) -> Dict:
+    """write the corpus into root (replacing it), returns counts"""
+    rng = random.Random(seed)
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    for entry in SKELETON:
+        source, target = os.path.join(REPO_ROOT, entry), os.path.join(root, entry)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        (shutil.copytree if os.path.isdir(source) else shutil.copy2)(source, target)
+    os.makedirs(os.path.join(root, 'chapters'), exist_ok=True)
+    os.makedirs(os.path.join(root, 'imgs'), exist_ok=True)
+    head, tail = cached_frame(os.path.join(REPO_ROOT, TEMPLATE_CHAPTER))
+    template = os.path.join(root, 'template.html')
+    with open(template, 'w', encoding='utf-8') as f:
+        f.write(head + tail)
+
+    images = total = 0
+    for year, name in seasons(chapters):
+        start = season_start(year, name)
+        days = sorted(rng.sample(range(SEASON_DAYS), min(posts_per_chapter, SEASON_DAYS)), reverse=True)
+        posts = []
+        for i, offset in enumerate(days):
+            post_date = start + timedelta(days=offset)
+            image_paths = []
+            for j in range(images_per_post):
+                filename = f"{post_date.isoformat()}_{j}.{'png' if rng.random() < 0.3 else 'jpg'}"
+                write_image(os.path.join(root, 'imgs', filename), rng, image_size)
+                image_paths.append(f"../imgs/{filename}")
+                images += 1
+            body = ' '.join(f"<p>{sentence(rng, rng.randint(20, 60))}</p>" for _ in range(rng.randint(2, 6)))
+            body += ''.join(f'<img src="{path}" class="image-40 image-rounded" />' for path in image_paths[1:])
+            post_html = generate_post_html(
+                location=sentence(rng, 2), date=post_date, astro_status=rng.choice(ASTRO), main_content=body,
+                main_image=image_paths[0] if image_paths else '../imgs/lalala.png',
+                post_side='left' if i % 2 else 'right',
+                meanwhile_title=sentence(rng, 4) if rng.random() < 0.5 else None,
+                meanwhile_content=sentence(rng, 30) if rng.random() < 0.5 else None,
+            )
+            posts.append(POST_OPENING + post_html.strip('\n').rstrip() + POST_CLOSING)
+        page_head, page_tail = page_frame(new_chapter(year, name, template))
+        total += len(posts)
+        with open(os.path.join(root, chapter_file(year, name)), 'w', encoding='utf-8') as f:
+            f.write(page_head + ''.join(posts) + page_tail)
+    os.remove(template)
+    return {'chapters': chapters, 'posts': total, 'images': images}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='generate a synthetic loyal.love corpus')
+    parser.add_argument('output', help='directory to write the corpus into (replaced if it exists)')
+    parser.add_argument('--chapters', type=int, default=12, help='number of season chapters')
+    parser.add_argument('--posts', type=int, default=20, help='posts per chapter')
+    parser.add_argument('--images', type=int, default=1, help='images per post')
+    parser.add_argument('--image-size', default='1600x1200', help='WIDTHxHEIGHT of each image')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.image_size.lower().split('x'))
+    counts = generate_corpus(args.output, args.chapters, args.posts, args.images, (width, height), args.seed)
+    print(f"✅ wrote {counts['chapters']} chapters, {counts['posts']} posts and {counts['images']} images "
+          f"into {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,42 +1,222 @@
 #!/usr/bin/env python3
+"""
+streaming rss validator for loyal.love-website
+reads rss.xml with an incremental parser, dropping every item once it is
+checked, so memory stays flat however long the feed gets. checks the rss 2.0
+structure, rfc 822 dates, duplicate guids, that every loyal.love link lands on
+an existing page and post anchor, and the feed size and item budgets. it only
+needs the standard library and runs in milliseconds, so the post-commit hook
+runs it on every commit
+"""
 
-import feedparser
+import os
 import sys
-from typing import Dict, Tuple
+import html
+import time
+import json
+import argparse
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Set, Tuple
 
+from check_links import ID_PATTERN, mask, site_reference
 
-def validate_rss(file_path: str) -> Tuple[bool, Dict]:
 
-    feed = feedparser.parse(file_path)
-    if feed.bozo:
-        print(f"❌ error: {feed.bozo_exception}")
+########################################################
+#       constants
+########################################################
+
+BUDGET_CONFIG: str = '.github/workflows/.page-budgets.json'
+DEFAULT_BUDGET: Dict[str, int] = {'kb': 512, 'items': 200}
+CHANNEL_REQUIRED: List[str] = ['title', 'link', 'description']
+CHANNEL_DATES: List[str] = ['pubDate', 'lastBuildDate']
+
+
+########################################################
+#       checks
+########################################################
+
+def check_date(value: Optional[str]) -> Optional[str]:
+    """None for an rfc 822 date with a timezone, otherwise what is wrong with it"""
+    try:
+        parsed = parsedate_to_datetime((value or '').strip())
+    except (TypeError, ValueError):
+        return f"bad date {value!r}"
+    if parsed.tzinfo is None:
+        return f"date without a timezone {value!r}"
+    return None
+
+
+class AnchorIndex:
+    """ids per page, read the first time a feed link points at that page"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.pages: Dict[str, Optional[Set[str]]] = {}
+
+    def ids(self, page: str) -> Optional[Set[str]]:
+        if page not in self.pages:
+            try:
+                with open(os.path.join(self.root, page), 'r', encoding='utf-8', errors='ignore') as f:
+                    text = f.read()
+                self.pages[page] = {html.unescape(match.group(2)) for match in ID_PATTERN.finditer(mask(text))}
+            except OSError:
+                self.pages[page] = None
+        return self.pages[page]
+
+    def check(self, url: str) -> Optional[str]:
+        """None when a loyal.love url resolves to a page (and its #anchor), urls elsewhere are not checked"""
+        reference = site_reference(url)
+        if not reference.startswith('/'):
+            return None
+        path, _, fragment = reference.partition('#')
+        page = path.lstrip('/')
+        if not page or page.endswith('/'):
+            page += 'index.html'
+        ids = self.ids(page)
+        if ids is None:
+            return f"{url} points at a missing page {page}"
+        if fragment and fragment not in ids:
+            return f"{url} points at a missing anchor #{fragment} in {page}"
+        return None
+
+
+def check_item(item: ET.Element, number: int, guids: Set[str], anchors: AnchorIndex) -> List[str]:
+    """problems with one <item>"""
+    problems = []
+    where = f"item {number}"
+    title = item.findtext('title')
+    if title:
+        where += f" ({title.strip()[:40]})"
+    if not (title or item.findtext('description')):
+        problems.append(f"{where}: needs a title or a description")
+
+    link = (item.findtext('link') or '').strip()
+    problem = anchors.check(link) if link else 'is missing'
+    if problem:
+        problems.append(f"{where}: link {problem}")
+
+    guid = item.find('guid')
+    if guid is not None:
+        value = (guid.text or '').strip()
+        if value in guids:
+            problems.append(f"{where}: duplicate guid {value}")
+        guids.add(value)
+        if guid.get('isPermaLink', 'true') == 'true':
+            problem = None if value.startswith(('http://', 'https://')) else f"{value!r} is not a url"
+            if not problem and value != link:
+                problem = anchors.check(value)
+            if problem:
+                problems.append(f"{where}: permalink guid {problem}")
+
+    if item.find('pubDate') is not None:
+        problem = check_date(item.findtext('pubDate'))
+        if problem:
+            problems.append(f"{where}: {problem}")
+    return problems
+
+
+def validate_rss(file_path: str, budget: Optional[Dict[str, int]] = None, root: str = '.') -> Tuple[bool, Dict]:
+    """stream through a feed, returns (valid, feed info) and prints every problem"""
+    budget = budget or DEFAULT_BUDGET
+    started = time.perf_counter()
+    problems: List[str] = []
+    guids: Set[str] = set()
+    anchors = AnchorIndex(root)
+    info = {'title': 'N/A', 'description': 'N/A', 'link': 'N/A', 'entries': 0}
+    channel: Optional[ET.Element] = None
+    depth = 0
+
+    try:
+        size = os.path.getsize(file_path)
+        for event, element in ET.iterparse(file_path, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if depth == 1 and (element.tag != 'rss' or element.get('version') != '2.0'):
+                    problems.append(f"root element is <{element.tag} version={element.get('version')!r}>, "
+                                    f"not <rss version=\"2.0\">")
+                elif depth == 2 and element.tag == 'channel':
+                    if channel is not None:
+                        problems.append("more than one <channel>")
+                    channel = element
+                continue
+            depth -= 1
+            if element.tag == 'item' and depth == 2:
+                info['entries'] += 1
+                problems.extend(check_item(element, info['entries'], guids, anchors))
+                # checked items are dropped so the tree never holds more than one
+                if channel is not None:
+                    channel.remove(element)
+    except ET.ParseError as e:
+        line, column = e.position
+        print(f"❌ error: {file_path}:{line}:{column} is not well-formed xml ({e})")
         return False, None
-        
-    feed_info = {
-        'title': feed.feed.get('title', 'N/A'),
-        'description': feed.feed.get('description', 'N/A'),
-        'link': feed.feed.get('link', 'N/A'),
-        'entries': len(feed.entries)
-    }
-    
-    print("✅ feed is valid!")
-    print(f"    - title: {feed_info['title']}")
-    print(f"    - description: {feed_info['description']}")
-    print(f"    - link: {feed_info['link']}")
-    print(f"    - number of entries: {feed_info['entries']}")
-    
-    return True, feed_info
+    except OSError as e:
+        print(f"❌ error: {e}")
+        return False, None
+
+    if channel is None:
+        problems.append("no <channel>")
+    else:
+        for name in CHANNEL_REQUIRED:
+            value = (channel.findtext(name) or '').strip()
+            if not value:
+                problems.append(f"channel: no <{name}>")
+            info[name] = value or 'N/A'
+        for name in CHANNEL_DATES:
+            if channel.find(name) is not None:
+                problem = check_date(channel.findtext(name))
+                if problem:
+                    problems.append(f"channel <{name}>: {problem}")
+
+    if size > budget['kb'] * 1024:
+        problems.append(f"feed is {size / 1024:.0f}kb > budget {budget['kb']}kb")
+    if info['entries'] > budget['items']:
+        problems.append(f"feed has {info['entries']} items > budget {budget['items']}")
+
+    elapsed = (time.perf_counter() - started) * 1000
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        print(f"\n❌ {len(problems)} problems in {file_path}")
+        return False, info
+
+    print(f"✅ feed is valid! ({size / 1024:.0f}kb, checked in {elapsed:.1f}ms)")
+    print(f"    - title: {info['title']}")
+    print(f"    - description: {info['description']}")
+    print(f"    - link: {info['link']}")
+    print(f"    - number of entries: {info['entries']}")
+    return True, info
+
+
+def load_budget(config_path: str) -> Dict[str, int]:
+    """the "rss" entry of the page budgets, falling back to the defaults"""
+    budget = dict(DEFAULT_BUDGET)
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            budget.update(json.load(f).get('rss', {}))
+    except (OSError, ValueError):
+        pass
+    return budget
 
 
 def main() -> int:
-    if len(sys.argv) != 2:
-        print("usage: python validate_rss.py <rss_file>")
-        return 1
-    file_path = sys.argv[1]
-    is_valid, _ = validate_rss(file_path)
-    
+    parser = argparse.ArgumentParser(description='validate the rss feed: structure, dates, guids, links and budgets')
+    parser.add_argument('rss_file', nargs='?', default='rss.xml', help='feed to validate (default: rss.xml)')
+    parser.add_argument('--root', default='.', help='site the feed links are resolved against (default: .)')
+    parser.add_argument('--max-kb', type=int, help=f'feed size budget (default: from {BUDGET_CONFIG})')
+    parser.add_argument('--max-items', type=int, help=f'item count budget (default: from {BUDGET_CONFIG})')
+    args = parser.parse_args()
+
+    budget = load_budget(BUDGET_CONFIG)
+    if args.max_kb is not None:
+        budget['kb'] = args.max_kb
+    if args.max_items is not None:
+        budget['items'] = args.max_items
+    is_valid, _ = validate_rss(args.rss_file, budget, args.root)
+
     return 0 if is_valid else 1
 
 
 if __name__ == '__main__':
-    sys.exit(main()) 
+    sys.exit(main())
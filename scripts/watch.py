@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+file watching for loyal.love-website
+uses inotify through libc when available and falls back to mtime polling
+"""
+
+import os
+import sys
+import time
+import ctypes
+import select
+import struct
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+
+########################################################
+#       constants
+########################################################
+
+WATCH_DIRS: List[str] = ['.', 'chapters', 'posts', 'shared', 'css', 'scripts', 'imgs']
+IGNORED_NAMES = {'rss.xml', 'sitemap.xml.gz', 'manifest.json', 'anchors.json'}
+IGNORED_SUFFIXES = ('.gz', '.pyc', '.swp', '~', '_optimized.jpg', '_optimized.png', '_webp.webp', '_poster.jpg')
+DEBOUNCE_SECONDS: float = 0.1
+POLL_SECONDS: float = 0.5
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+########################################################
+#       helpers
+########################################################
+
+def is_ignored(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.startswith('.') or name in IGNORED_NAMES or name.endswith(IGNORED_SUFFIXES)
+
+
+def snapshot(directories: Iterable[str]) -> Dict[str, float]:
+    """mtime of every watched file, for the polling fallback"""
+    mtimes = {}
+    for directory in directories:
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_file() and not is_ignored(entry.name):
+                    mtimes[os.path.normpath(entry.path)] = entry.stat().st_mtime
+    return mtimes
+
+
+def open_inotify(directories: Iterable[str]) -> Optional[tuple]:
+    """(fd, {wd: directory}) or None when inotify is not available"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL('libc.so.6', use_errno=True)
+        fd = libc.inotify_init()
+        if fd < 0:
+            return None
+        watches = {}
+        for directory in directories:
+            if os.path.isdir(directory):
+                wd = libc.inotify_add_watch(fd, directory.encode(), WATCH_MASK)
+                if wd >= 0:
+                    watches[wd] = directory
+        return fd, watches
+    except (OSError, AttributeError):
+        return None
+
+
+def read_inotify(fd: int, watches: Dict[int, str], timeout: Optional[float]) -> Set[str]:
+    """changed paths from one read, waiting at most timeout seconds"""
+    ready, _, _ = select.select([fd], [], [], timeout)
+    if not ready:
+        return set()
+    data = os.read(fd, 64 * 1024)
+    changed, offset = set(), 0
+    while offset < len(data):
+        wd, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+        name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0').decode(errors='ignore')
+        offset += EVENT_HEADER.size + length
+        if name and not is_ignored(name) and wd in watches:
+            changed.add(os.path.normpath(os.path.join(watches[wd], name)))
+    return changed
+
+
+########################################################
+#       watcher
+########################################################
+
+def watch(callback: Callable[[Set[str]], None], stop: threading.Event,
+          directories: List[str] = WATCH_DIRS) -> None:
+    """call callback(changed paths) after each burst of edits until stop is set"""
+    inotify = open_inotify(directories)
+    if inotify:
+        fd, watches = inotify
+        print(f"👀 watching {len(watches)} directories with inotify")
+        try:
+            while not stop.is_set():
+                changed = read_inotify(fd, watches, 0.5)
+                if not changed:
+                    continue
+                # editors write in several steps, wait for the burst to settle
+                while True:
+                    more = read_inotify(fd, watches, DEBOUNCE_SECONDS)
+                    if not more:
+                        break
+                    changed |= more
+                callback(changed)
+        finally:
+            os.close(fd)
+        return
+
+    print(f"👀 watching {len(directories)} directories by polling every {POLL_SECONDS}s")
+    previous = snapshot(directories)
+    while not stop.wait(POLL_SECONDS):
+        current = snapshot(directories)
+        changed = {path for path in set(previous) | set(current) if previous.get(path) != current.get(path)}
+        previous = current
+        if changed:
+            callback(changed)
+
+
+def start_watching(callback: Callable[[Set[str]], None], directories: List[str] = WATCH_DIRS) -> threading.Event:
+    """run watch() in a daemon thread, returns the event that stops it"""
+    stop = threading.Event()
+    thread = threading.Thread(target=watch, args=(callback, stop, directories), daemon=True)
+    thread.start()
+    return stop
+
+
+if __name__ == '__main__':
+    stop_event = start_watching(lambda paths: print(f"changed: {', '.join(sorted(paths))}"))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop_event.set()
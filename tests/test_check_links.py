@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+tests for the pooled external link checker in scripts/check_links.py
+against a stub http server on 127.0.0.1, standard library only:
+python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+import http.server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from check_links import check_external
+
+
+########################################################
+#       stub server
+########################################################
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+    connections = set()
+
+    def answer(self, with_body):
+        StubHandler.requests.append((self.command, self.path))
+        StubHandler.connections.add(self.client_address)
+        if self.path == '/slow':
+            time.sleep(2)
+        if self.path == '/no-head' and self.command == 'HEAD':
+            status = 405
+        else:
+            status = {'/ok': 200, '/no-head': 200, '/moved': 301, '/slow': 200}.get(self.path, 404)
+        body = b'ok' if with_body else b''
+        self.send_response(status)
+        if status == 301:
+            self.send_header('Location', '/ok')
+        self.send_header('Content-Length', str(len(body) if with_body else 0))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.answer(False)
+
+    def do_GET(self):
+        self.answer(True)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+
+########################################################
+#       tests
+########################################################
+
+class CheckExternalTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingServer(('127.0.0.1', 0), StubHandler)
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubHandler.requests = []
+        StubHandler.connections = set()
+        self.directory = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.directory, 'external-links.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check(self, paths, jobs=4, timeout=0.5):
+        return check_external([self.base + path for path in paths], jobs, timeout, 3600, self.cache_path)
+
+    def test_results(self):
+        errors = self.check(['/ok', '/missing', '/moved', '/no-head', '/slow'])
+        self.assertEqual(set(errors), {self.base + '/missing', self.base + '/slow'})
+        self.assertEqual(errors[self.base + '/missing'], 'http 404')
+        self.assertIn('timed out', errors[self.base + '/slow'])
+        # a 405 to HEAD is retried with GET
+        self.assertIn(('GET', '/no-head'), StubHandler.requests)
+
+    def test_keep_alive_connection_is_reused(self):
+        self.assertEqual(self.check(['/ok', '/moved', '/no-head'], jobs=1), {})
+        self.assertEqual(len(StubHandler.requests), 4)
+        self.assertEqual(len(StubHandler.connections), 1)
+
+    def test_good_results_are_cached(self):
+        self.check(['/ok', '/moved', '/missing'])
+        with open(self.cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)['urls']
+        self.assertEqual(set(cached), {self.base + '/ok', self.base + '/moved'})
+
+        StubHandler.requests = []
+        errors = self.check(['/ok', '/moved', '/missing'])
+        # only the broken url is asked again, the good ones come from the cache
+        self.assertEqual(StubHandler.requests, [('HEAD', '/missing')])
+        self.assertEqual(set(errors), {self.base + '/missing'})
+
+    def test_expired_results_are_checked_again(self):
+        self.check(['/ok'])
+        StubHandler.requests = []
+        check_external([self.base + '/ok'], 1, 0.5, 0, self.cache_path)
+        self.assertEqual(StubHandler.requests, [('HEAD', '/ok')])
+
+
+if __name__ == '__main__':
+    unittest.main()
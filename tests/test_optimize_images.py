@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+tests for the image manifest written by scripts/optimize-images.py and read by
+scripts/build_pages.py, on a throwaway site: python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+import io
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from PIL import Image
+
+from build import load_script
+from build_pages import inline_placeholders
+
+optimizer = load_script('optimize-images.py')
+
+
+class ManifestKeyTest(unittest.TestCase):
+    """pages find their placeholder however --directory was written"""
+
+    def setUp(self):
+        self.previous = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        os.makedirs('imgs')
+        Image.new('RGB', (64, 48), (200, 40, 40)).save('imgs/moon.png')
+
+    def tearDown(self):
+        os.chdir(self.previous)
+        shutil.rmtree(self.directory)
+
+    def placeholder_for(self, directory: str) -> str:
+        with contextlib.redirect_stdout(io.StringIO()):
+            optimizer.optimize_images_in_directory(directory)
+        manifest = optimizer.load_manifest('imgs/manifest.json')
+        self.assertEqual(sorted(manifest), ['imgs/moon.png'])
+        return inline_placeholders('<img src="../imgs/moon.png" alt="moon" />', 'chapters/25_summer.html',
+                                   {'image_manifest': manifest})
+
+    def test_dotted_directory(self):
+        self.assertIn('data-placeholder', self.placeholder_for('./imgs'))
+
+    def test_absolute_directory(self):
+        self.assertIn('data-placeholder', self.placeholder_for(os.path.join(self.directory, 'imgs')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+tests for the posts/ records in scripts/post_store.py, on a throwaway site
+in a temporary directory: python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+import post_store
+from post_store import adopt_formatting, load_post, record_path, render_page, save_post
+
+
+PAGE = '''<html>
+<body>
+    <div class="frame">title</div>
+
+{posts}<!-- ............................................................................................... -->
+<!-- ...................................      FOOTER      ...................................... -->
+<!-- ............................................................................................... -->
+    <div class="footer">footer</div>
+</body>
+</html>
+'''
+
+
+def post_body(post_id: str, text: str, image: str = '') -> str:
+    image_tag = f'\n        <img src="{image}" alt="Post image" />' if image else ''
+    return (post_store.POST_OPENING + f'    <hr class="between-posts" id="{post_id}" />\n'
+            f'    <div class="post-content">\n        <h3 class="post-text">{text}</h3>{image_tag}\n    </div>'
+            + post_store.POST_CLOSING)
+
+
+class SiteTestCase(unittest.TestCase):
+    """runs every test inside a fresh site directory"""
+
+    def setUp(self):
+        self.previous = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        os.makedirs('chapters')
+        post_store._record_cache.clear()
+        post_store._frame_cache.clear()
+
+    def tearDown(self):
+        os.chdir(self.previous)
+        shutil.rmtree(self.directory)
+
+    def write_page(self, page: str, posts: str = '') -> None:
+        with open(page, 'w', encoding='utf-8') as f:
+            f.write(PAGE.format(posts=posts))
+
+    def read(self, path: str) -> str:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def add_record(self, post_id: str, page: str, text: str, image: str = '') -> None:
+        save_post({'id': post_id, 'date': post_store.post_date(post_id), 'page': page, 'title': text,
+                   'image': image, 'body': post_body(post_id, text, image)})
+
+
+class AdoptFormattingTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.page = 'chapters/25_summer.html'
+        self.write_page(self.page)
+        self.add_record('2025_august_18', self.page, 'hello there')
+        render_page(self.page)
+
+    def test_whitespace_changes_reach_the_record(self):
+        formatted = self.read(self.page).replace('<h3 class="post-text">hello there</h3>',
+                                                 '<h3 class="post-text">\n          hello there\n        </h3>')
+        with open(self.page, 'w', encoding='utf-8') as f:
+            f.write(formatted)
+        self.assertEqual(adopt_formatting(self.page), ['2025_august_18'])
+        self.assertFalse(render_page(self.page))
+        self.assertEqual(self.read(self.page), formatted)
+
+    def test_other_edits_stay_overwritten(self):
+        edited = self.read(self.page).replace('hello there', 'hello world')
+        with open(self.page, 'w', encoding='utf-8') as f:
+            f.write(edited)
+        self.assertEqual(adopt_formatting(self.page), [])
+        self.assertIn('hello there', load_post(record_path('2025_august_18'))['body'])
+        self.assertTrue(render_page(self.page))
+        self.assertNotIn('hello world', self.read(self.page))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+tests for moving posts out of index.html in scripts/rotate_archive.py:
+python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from test_post_store import SiteTestCase
+
+from post_store import load_post, record_path
+from rotate_archive import rotate
+
+
+class RotateTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs('shared')
+        with open('shared/footer.html', 'w', encoding='utf-8') as f:
+            f.write('<div class="footer-season-links">\n  <a href="/" class="footer-season-link">x</a>\n</div>\n')
+        self.write_page('chapters/25_spring.html')
+        self.add_record('2025_august_18', 'index.html', 'summer post', image='imgs/berlin_moon.webp')
+        self.add_record('2025_october_2', 'index.html', 'autumn post')
+        self.write_page('index.html')
+
+    def test_moved_post_keeps_its_image(self):
+        moved = rotate(date(2025, 10, 15))
+        self.assertEqual(moved, {'chapters/25_summer.html': ['2025_august_18']})
+
+        post = load_post(record_path('2025_august_18'))
+        self.assertEqual(post['page'], 'chapters/25_summer.html')
+        self.assertEqual(post['image'], '../imgs/berlin_moon.webp')
+        self.assertIn('src="../imgs/berlin_moon.webp"', post['body'])
+        self.assertIn('src="../imgs/berlin_moon.webp"', self.read('chapters/25_summer.html'))
+        self.assertNotIn('summer post', self.read('index.html'))
+        self.assertEqual(load_post(record_path('2025_october_2'))['page'], 'index.html')
+
+
+if __name__ == '__main__':
+    unittest.main()